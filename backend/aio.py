@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+# Blocking yfinance (and other sync library) calls run on their own sized
+# pool instead of Starlette's shared threadpool, so a slow upstream can't
+# starve the rest of the app.
+YF_WORKERS = int(os.environ.get("YF_WORKERS", "64"))
+_executor = ThreadPoolExecutor(max_workers=YF_WORKERS, thread_name_prefix="yfinance")
+
+# One pooled keep-alive client for data.sec.gov, www.sec.gov and Yahoo's
+# search API, so repeat calls skip the TCP and TLS handshakes.
+HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+HTTP_TIMEOUT = httpx.Timeout(15.0, connect=5.0)
+
+_client: httpx.AsyncClient | None = None
+
+
+def http() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+    return _client
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the dedicated executor, keeping the caller's context vars."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+class BlockingReader:
+    """Blocking file-like view of an async byte stream, for parsers running on the executor.
+
+    Each read pulls the next chunk from the event loop, so a slow parser
+    applies backpressure instead of buffering the whole body.
+    """
+
+    def __init__(self, chunks, loop: asyncio.AbstractEventLoop):
+        self._chunks = chunks.__aiter__()
+        self._loop = loop
+        self._buffer = memoryview(b"")
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._buffer:
+            future = asyncio.run_coroutine_threadsafe(self._chunks.__anext__(), self._loop)
+            try:
+                self._buffer = memoryview(future.result())
+            except StopAsyncIteration:
+                return b""
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return bytes(data)
@@ -0,0 +1,246 @@
+import json
+import os
+import time
+import logging
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+import cache
+
+logger = logging.getLogger(__name__)
+
+# Downloaded history is kept on disk as one memory-mapped .npy file per
+# (symbol, interval), plus a small JSON sidecar. Requests are served as
+# slices of that store; upstream is only asked for bars after the last one
+# we already have.
+BARS_DIR = Path(os.environ.get("BARS_DIR", Path(__file__).parent / "data" / "bars"))
+
+BAR_DTYPE = np.dtype([
+    ("time", "i8"),
+    ("open", "f8"),
+    ("high", "f8"),
+    ("low", "f8"),
+    ("close", "f8"),
+    ("volume", "f8"),
+])
+COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+# Approximate span of each yfinance period, used to decide whether the store
+# already covers a request.
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183, "ytd": 366,
+    "1y": 366, "2y": 731, "5y": 1827, "10y": 3653, "max": float("inf"),
+}
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+
+# Period downloaded the first time an interval is seen, so later ranges on
+# the same interval are already covered.
+BACKFILL = {"5m": "5d", "15m": "1mo", "1h": "3mo", "1d": "1y", "1wk": "5y", "1mo": "max"}
+
+# How long a synced store is trusted before asking upstream for new bars.
+SYNC_TTL = {"5m": 60, "15m": 120, "1h": 300, "1d": 300, "1wk": 3600, "1mo": 3600}
+
+# Yahoo only serves intraday bars for roughly the last 60 days, so older
+# intraday bars are dropped and a store that has fallen further behind is
+# rebuilt from scratch.
+INTRADAY_INTERVALS = ("5m", "15m", "30m", "1h")
+INTRADAY_RETENTION_DAYS = 55
+
+# Relative difference between a stored bar and upstream's copy of it that
+# means the history was re-adjusted (even small dividends move prices by
+# more than this; float noise stays far below it).
+ADJUSTMENT_TOLERANCE = 5e-4
+
+
+def _paths(symbol: str, interval: str) -> tuple[Path, Path]:
+    stem = f"{quote(symbol.upper(), safe='')}_{interval}"
+    return BARS_DIR / f"{stem}.npy", BARS_DIR / f"{stem}.json"
+
+
+def _load(symbol: str, interval: str) -> tuple[np.ndarray | None, dict]:
+    data_path, meta_path = _paths(symbol, interval)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return np.load(data_path, mmap_mode="r"), meta
+    except (FileNotFoundError, ValueError):
+        return None, {}
+
+
+def _save(symbol: str, interval: str, bars: np.ndarray, meta: dict):
+    BARS_DIR.mkdir(parents=True, exist_ok=True)
+    data_path, meta_path = _paths(symbol, interval)
+    # Write to temp files and rename so readers never see a partial store.
+    tmp_data = data_path.with_suffix(f".{os.getpid()}.tmp.npy")
+    tmp_meta = meta_path.with_suffix(f".{os.getpid()}.tmp")
+    np.save(tmp_data, bars)
+    with open(tmp_meta, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_meta, meta_path)
+
+
+def _to_records(hist: pd.DataFrame) -> np.ndarray:
+    bars = np.empty(len(hist), dtype=BAR_DTYPE)
+    index = hist.index.tz_convert("UTC").tz_localize(None) if hist.index.tz is not None else hist.index
+    bars["time"] = index.to_numpy(dtype="datetime64[ns]").view("i8")
+    for field, column in COLUMNS.items():
+        bars[field] = hist[column].to_numpy(dtype="f8")
+    return bars
+
+
+def _to_frame(bars: np.ndarray, tz: str | None) -> pd.DataFrame:
+    index = pd.to_datetime(np.asarray(bars["time"]), unit="ns", utc=True)
+    if tz:
+        index = index.tz_convert(tz)
+    return pd.DataFrame({column: np.asarray(bars[field]) for field, column in COLUMNS.items()}, index=index)
+
+
+def _covers(stored_period: str | None, period: str) -> bool:
+    if stored_period is None:
+        return False
+    return PERIOD_DAYS.get(stored_period, 0) >= PERIOD_DAYS.get(period, float("inf"))
+
+
+def _download(symbol: str, interval: str, **kwargs) -> pd.DataFrame:
+    return yf.Ticker(symbol).history(interval=interval, **kwargs)
+
+
+def _rebased(stored: np.ndarray, new: np.ndarray) -> bool:
+    """True if upstream's copy of a stored bar no longer matches it.
+
+    yfinance back-adjusts all earlier prices after a split or dividend, so
+    bars fetched now would not line up with the adjusted history we kept.
+    """
+    i = np.searchsorted(stored["time"], new["time"][0])
+    if i >= len(stored) or stored["time"][i] != new["time"][0]:
+        return False
+    return any(
+        not np.isclose(stored[field][i], new[field][0], rtol=ADJUSTMENT_TOLERANCE)
+        for field in ("open", "high", "low", "close")
+    )
+
+
+def _sync(symbol: str, interval: str, period: str) -> tuple[str, pd.DataFrame] | None:
+    """Bring the on-disk store up to date and return (covered period, frame)."""
+    stored, meta = _load(symbol, interval)
+    is_intraday = interval in INTRADAY_INTERVALS
+    covered = meta.get("period")
+
+    needs_backfill = stored is None or len(stored) == 0 or not _covers(covered, period)
+    if not needs_backfill and is_intraday:
+        last_age_days = (time.time() - stored["time"][-1] / 1e9) / 86400
+        needs_backfill = last_age_days > INTRADAY_RETENTION_DAYS
+
+    if not needs_backfill:
+        # Re-fetch from the next-to-last stored bar onwards: the last one may
+        # have been revised, and the one before it is settled, so it shows
+        # whether upstream has re-adjusted the history.
+        settled = len(stored) >= 2
+        anchor = pd.Timestamp(int(stored["time"][-2 if settled else -1]), unit="ns", tz="UTC")
+        if meta.get("tz"):
+            anchor = anchor.tz_convert(meta["tz"])
+        start = anchor if is_intraday else anchor.normalize()
+        bars = np.asarray(stored)
+        try:
+            delta = _download(symbol, interval, start=start)
+        except Exception as e:
+            # Serve what we have; the next sync will try again.
+            logger.warning(f"Delta fetch failed for {symbol} {interval}: {e}")
+            return covered, _to_frame(bars, meta.get("tz"))
+        new = _to_records(delta) if not delta.empty else None
+        # With a single stored bar the anchor is the live bar itself, whose
+        # revisions say nothing about re-adjustment.
+        if new is not None and settled and _rebased(bars, new):
+            logger.info(f"{symbol} {interval} prices were re-adjusted upstream; rebuilding the store")
+            needs_backfill = True
+            # Rebuild everything the store covered, not just this request.
+            period = covered
+        else:
+            if new is not None:
+                bars = np.concatenate([bars[bars["time"] < new["time"][0]], new])
+            if is_intraday:
+                cutoff = (time.time() - INTRADAY_RETENTION_DAYS * 86400) * 1e9
+                bars = bars[bars["time"] >= cutoff]
+
+    if needs_backfill:
+        backfill = BACKFILL.get(interval, period)
+        fetch_period = period if _covers(period, backfill) else backfill
+        hist = _download(symbol, interval, period=fetch_period)
+        if hist.empty:
+            return None
+        bars = _to_records(hist)
+        meta = {"period": fetch_period, "tz": str(hist.index.tz) if hist.index.tz else None}
+
+    meta["synced_at"] = time.time()
+    try:
+        _save(symbol, interval, bars, meta)
+    except OSError as e:
+        logger.warning(f"Could not persist bars for {symbol} {interval}: {e}")
+    return meta["period"], _to_frame(bars, meta.get("tz"))
+
+
+def _slice(frame: pd.DataFrame, period: str) -> pd.DataFrame:
+    if frame.empty or period in ("max", None):
+        return frame
+    if period in ("1d", "5d"):
+        # Trading sessions rather than calendar days, like yfinance.
+        sessions = frame.index.normalize()
+        keep = sessions.unique()[-int(period[0]):]
+        return frame[sessions.isin(keep)]
+    if period == "ytd":
+        start = frame.index[-1].replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        return frame[frame.index >= start]
+    offset = PERIOD_OFFSETS.get(period)
+    if offset is None:
+        return frame
+    now = pd.Timestamp.now(tz=frame.index.tz)
+    return frame[frame.index >= now.normalize() - offset]
+
+
+def version(frame: pd.DataFrame) -> str:
+    """Cheap fingerprint of a bar frame that changes when bars are added or the last one is revised."""
+    if frame.empty:
+        return "0"
+    last = frame.iloc[-1]
+    return f"{len(frame)}-{frame.index[-1].value}-{last['Close']:.6g}-{last['Volume']:.0f}"
+
+
+def chart_times(dates: pd.DatetimeIndex, interval: str, epoch: bool = False) -> np.ndarray:
+    """Chart timestamps for a whole index: epoch seconds intraday, YYYY-MM-DD otherwise.
+
+    With epoch=True, daily and longer bars are given as the epoch seconds of
+    UTC midnight on their date instead of as strings.
+    """
+    if interval in INTRADAY_INTERVALS:
+        utc = dates.tz_convert("UTC").tz_localize(None) if dates.tz is not None else dates
+        return utc.to_numpy(dtype="datetime64[s]").astype("i8")
+    local = dates.tz_localize(None) if dates.tz is not None else dates
+    days = local.to_numpy(dtype="datetime64[D]")
+    if epoch:
+        return days.astype("datetime64[s]").astype("i8")
+    return np.datetime_as_string(days, unit="D")
+
+
+def get_history(symbol: str, period: str, interval: str) -> pd.DataFrame:
+    """OHLCV bars like yf.Ticker(symbol).history(period, interval), served from the bar store."""
+    cache_key = f"bars:{symbol.upper()}:{interval}"
+    ttl = SYNC_TTL.get(interval, 300)
+    synced = cache.get_or_fetch(cache_key, ttl, lambda: _sync(symbol, interval, period))
+    if synced is not None and not _covers(synced[0], period):
+        cache.delete(cache_key)
+        synced = cache.get_or_fetch(cache_key, ttl, lambda: _sync(symbol, interval, period))
+    if synced is None:
+        return pd.DataFrame(columns=list(COLUMNS.values()))
+    return _slice(synced[1], period)
@@ -1,18 +1,517 @@
+import asyncio
+import builtins
+import contextvars
+import logging
+import sys
 import time
 import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Awaitable, Callable
 
-_cache: dict[str, tuple[float, object]] = {}
+import cache_backends
+
+logger = logging.getLogger(__name__)
+
+# Budgets per key namespace (the prefix before the first ":"), as
+# (max entries, approximate max bytes). Least recently used entries are
+# evicted once either limit is exceeded.
+NAMESPACE_LIMITS: dict[str, tuple[int, int]] = {
+    "info": (5000, 128 * 1024 * 1024),
+    "quote": (5000, 16 * 1024 * 1024),
+    "search": (2000, 16 * 1024 * 1024),
+    "ohlc": (2000, 256 * 1024 * 1024),
+    "bars": (2000, 512 * 1024 * 1024),
+    "ind": (5000, 256 * 1024 * 1024),
+    "news": (1000, 64 * 1024 * 1024),
+    "edgar": (200, 512 * 1024 * 1024),
+    # Older submissions shards, kept apart so one large filer's history
+    # can't push company facts out of "edgar".
+    "edgar_shard": (64, 64 * 1024 * 1024),
+    "portfolio": (16, 16 * 1024 * 1024),
+    "agent": (2000, 64 * 1024 * 1024),
+}
+DEFAULT_LIMITS = (1000, 64 * 1024 * 1024)
+
+# How often the background sweeper drops expired entries (seconds).
+SWEEP_INTERVAL = 60
+
+# Optional store shared across worker processes (see cache_backends). The
+# in-process entries stay in front of it as a first level. Bar frames are
+# kept local: the on-disk bar store already shares them between workers.
+_shared = cache_backends.from_env()
+LOCAL_NAMESPACES = {"bars"}
+# Shared-store lifetime for entries written before any reader gave a TTL.
+SHARED_DEFAULT_TTL = 3600
+
+
+class _Entry:
+    __slots__ = ("stored_at", "value", "size", "ttl")
+
+    def __init__(self, value: object, size: int, stored_at: float | None = None):
+        self.stored_at = stored_at if stored_at is not None else time.time()
+        self.value = value
+        self.size = size
+        self.ttl: int | None = None
+
+
+class _Call:
+    """An in-flight fetch that concurrent callers for the same key wait on."""
+
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: object = None
+        self.error: BaseException | None = None
+
+
+class _Namespace:
+    def __init__(self, name: str):
+        self.name = name
+        self.max_entries, self.max_bytes = NAMESPACE_LIMITS.get(name, DEFAULT_LIMITS)
+        self.entries: OrderedDict[str, _Entry] = OrderedDict()
+        self.bytes = 0
+        # TTLs are supplied by readers, so remember the longest one seen to
+        # decide when an entry that was never read again has expired.
+        self.max_ttl = 0
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def remove(self, key: str) -> _Entry | None:
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+        return entry
+
+    def is_expired(self, entry: _Entry, now: float) -> bool:
+        ttl = entry.ttl if entry.ttl is not None else self.max_ttl
+        return ttl > 0 and (now - entry.stored_at) >= ttl
+
+    def enforce_limits(self):
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= entry.size
+            self.evictions += 1
+
+
+_namespaces: dict[str, _Namespace] = {}
 _lock = threading.Lock()
+_sweeper: threading.Thread | None = None
+_inflight: dict[str, _Call] = {}
+# Async counterparts, used from the event loop only.
+_ainflight: dict[str, asyncio.Future] = {}
+_background: builtins.set[asyncio.Task] = builtins.set()
+# Entries read while handling the current HTTP request (see track()).
+_reads: contextvars.ContextVar[dict | None] = contextvars.ContextVar("cache_reads", default=None)
+
+
+def _namespace(key: str) -> _Namespace:
+    name = key.split(":", 1)[0]
+    ns = _namespaces.get(name)
+    if ns is None:
+        ns = _namespaces[name] = _Namespace(name)
+    return ns
+
+
+_SCALAR_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _approx_size(obj: object) -> int:
+    """Rough deep size of a cached value in bytes."""
+    total = 0
+    seen: builtins.set[int] = builtins.set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        kind = type(item)
+        if kind in _SCALAR_TYPES:
+            total += sys.getsizeof(item)
+            continue
+        if kind is dict:
+            total += sys.getsizeof(item)
+            stack.extend(item.keys())
+            stack.extend(item.values())
+            continue
+        if kind is list or kind is tuple:
+            total += sys.getsizeof(item)
+            stack.extend(item)
+            continue
+
+        nbytes = getattr(item, "nbytes", None)
+        if isinstance(nbytes, int):
+            # numpy arrays and similar buffers
+            total += nbytes
+            if getattr(getattr(item, "dtype", None), "kind", None) == "O":
+                # Object arrays only hold pointers; count what they point to.
+                stack.extend(item.ravel().tolist())
+            continue
+        memory_usage = getattr(item, "memory_usage", None)
+        if callable(memory_usage):
+            # pandas objects
+            try:
+                usage = memory_usage(deep=True)
+                total += int(usage.sum() if hasattr(usage, "sum") else usage)
+                continue
+            except Exception:
+                pass
+
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, builtins.set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(SWEEP_INTERVAL)
+        sweep()
+        if _shared is not None:
+            _shared_call("sweep")
+
+
+def _ensure_sweeper():
+    global _sweeper
+    if _sweeper is None:
+        _sweeper = threading.Thread(target=_sweep_loop, name="cache-sweeper", daemon=True)
+        _sweeper.start()
+
+
+def sweep() -> int:
+    """Drop every expired entry. Returns the number of entries removed."""
+    removed = 0
+    now = time.time()
+    with _lock:
+        for ns in _namespaces.values():
+            expired = [k for k, e in ns.entries.items() if ns.is_expired(e, now)]
+            for key in expired:
+                ns.remove(key)
+            ns.expirations += len(expired)
+            removed += len(expired)
+    return removed
+
+
+@contextmanager
+def track():
+    """Record the entries read in this context as {key: (stored_at, ttl)}.
+
+    stored_at identifies the version of the value that was used and is None
+    if the key was missed and not filled in this context (e.g. another
+    caller's fetch was awaited). http_cache derives ETags and max-age from it.
+    """
+    reads: dict[str, tuple[float | None, int | None]] = {}
+    token = _reads.set(reads)
+    try:
+        yield reads
+    finally:
+        _reads.reset(token)
+
+
+def _record(key: str, stored_at: float | None, ttl: int | None = None):
+    reads = _reads.get()
+    if reads is None:
+        return
+    previous = reads.get(key)
+    if previous is None:
+        reads[key] = (stored_at, ttl)
+    elif previous[0] is None:
+        # Filled by this context's own fetch. A version already seen stays,
+        # so a background refresh can't relabel the value that was served.
+        reads[key] = (stored_at, previous[1])
+
+
+def _untracked(fetch: Callable[[], object]) -> object:
+    # What a fetch reads only matters through the entry it produces.
+    token = _reads.set(None)
+    try:
+        return fetch()
+    finally:
+        _reads.reset(token)
+
+
+def _is_shared(key: str) -> bool:
+    return _shared is not None and key.split(":", 1)[0] not in LOCAL_NAMESPACES
+
+
+def _shared_call(method: str, *args):
+    # The shared store is an optimization: if it is down, act as a miss.
+    try:
+        return getattr(_shared, method)(*args)
+    except Exception as e:
+        logger.warning(f"Shared cache ({_shared.name}) {method} failed: {e}")
+        return None
+
+
+def _lookup_local(key: str, ttl: int, retention: int) -> tuple[bool, object | None, bool]:
+    with _lock:
+        ns = _namespace(key)
+        ns.max_ttl = max(ns.max_ttl, retention)
+        entry = ns.entries.get(key)
+        if entry is not None:
+            entry.ttl = max(entry.ttl or 0, retention)
+            age = time.time() - entry.stored_at
+            if age < retention:
+                ns.entries.move_to_end(key)
+                ns.hits += 1
+                _record(key, entry.stored_at, ttl)
+                return True, entry.value, age < ttl
+    return False, None, False
+
+
+def _accept_shared(key: str, found, ttl: int, retention: int) -> tuple[object | None, bool]:
+    """Finish a lookup that missed locally, given the shared store's (stored_at, value) or None."""
+    if found is not None:
+        stored_at, value = found
+        age = time.time() - stored_at
+        if age < retention:
+            # Keep the original store time so every worker expires it together.
+            _store_local(key, value, stored_at)
+            with _lock:
+                _namespace(key).shared_hits += 1
+            _record(key, stored_at, ttl)
+            return value, age < ttl
+
+    with _lock:
+        _namespace(key).misses += 1
+    _record(key, None, ttl)
+    return None, False
+
+
+def lookup(key: str, ttl: int, stale_ttl: int = 0) -> tuple[object | None, bool]:
+    """Return (value, fresh). Entries up to stale_ttl past their TTL come back with fresh=False."""
+    retention = ttl + stale_ttl
+    hit, value, fresh = _lookup_local(key, ttl, retention)
+    if hit:
+        return value, fresh
+    found = _shared_call("get", key) if _is_shared(key) else None
+    return _accept_shared(key, found, ttl, retention)
+
+
+async def alookup(key: str, ttl: int, stale_ttl: int = 0) -> tuple[object | None, bool]:
+    """lookup() for the event loop: the shared store is queried on a worker thread."""
+    retention = ttl + stale_ttl
+    hit, value, fresh = _lookup_local(key, ttl, retention)
+    if hit:
+        return value, fresh
+    found = await asyncio.to_thread(_shared_call, "get", key) if _is_shared(key) else None
+    return _accept_shared(key, found, ttl, retention)
 
 
 def get(key: str, ttl: int) -> object | None:
+    value, fresh = lookup(key, ttl)
+    return value if fresh else None
+
+
+def _run_fetch(key: str, call: _Call, fetch: Callable[[], object]):
+    try:
+        value = _untracked(fetch)
+        if value is not None:
+            set(key, value)
+        call.value = value
+    except BaseException as e:
+        call.error = e
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        call.done.set()
+
+
+def _refresh_in_background(key: str, fetch: Callable[[], object]):
     with _lock:
-        entry = _cache.get(key)
-        if entry and (time.time() - entry[0]) < ttl:
-            return entry[1]
-    return None
+        if key in _inflight:
+            return
+        call = _inflight[key] = _Call()
+
+    def run():
+        _run_fetch(key, call, fetch)
+        if call.error is not None:
+            logger.warning(f"Background refresh of {key} failed: {call.error}")
+
+    threading.Thread(target=run, name=f"cache-refresh:{key}", daemon=True).start()
+
+
+def get_or_fetch(key: str, ttl: int, fetch: Callable[[], object], stale_ttl: int = 0) -> object | None:
+    """Return the cached value for key, calling fetch() on a miss.
+
+    Concurrent misses for the same key share a single fetch(). Values up to
+    stale_ttl seconds past their TTL are returned immediately while one
+    background refresh runs. A None result is returned but not cached.
+    """
+    value, fresh = lookup(key, ttl, stale_ttl)
+    if fresh:
+        return value
+    if value is not None:
+        _refresh_in_background(key, fetch)
+        return value
+
+    with _lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+
+    if leader:
+        _run_fetch(key, call, fetch)
+    else:
+        call.done.wait()
+
+    if call.error is not None:
+        raise call.error
+    return call.value
 
 
 def set(key: str, value: object):
+    stored_at = time.time()
+    _record(key, stored_at)
+    retention = _store_local(key, value, stored_at)
+    if _is_shared(key):
+        _shared_call("set", key, stored_at, value, retention or SHARED_DEFAULT_TTL)
+
+
+def aset(key: str, value: object):
+    """set() for the event loop: the shared-store write (pickling included) runs on a worker thread.
+
+    The local entry is visible at once; the shared write completes in the background.
+    """
+    stored_at = time.time()
+    _record(key, stored_at)
+    retention = _store_local(key, value, stored_at)
+    if _is_shared(key):
+        _spawn(asyncio.to_thread(_shared_call, "set", key, stored_at, value, retention or SHARED_DEFAULT_TTL))
+
+
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def _store_local(key: str, value: object, stored_at: float) -> int:
+    """Put value in this process's cache. Returns the entry's known retention (0 if none yet)."""
+    size = _approx_size(value)
+    with _lock:
+        ns = _namespace(key)
+        previous = ns.remove(key)
+        retention = (previous.ttl if previous is not None else None) or ns.max_ttl
+        if size > ns.max_bytes:
+            # Larger than the whole namespace budget: don't cache it at all.
+            ns.evictions += 1
+            return retention
+        entry = _Entry(value, size, stored_at)
+        if previous is not None:
+            entry.ttl = previous.ttl
+        ns.entries[key] = entry
+        ns.bytes += size
+        ns.enforce_limits()
+    _ensure_sweeper()
+    return retention
+
+
+def _consume_error(future: asyncio.Future):
+    # Mark a failed fetch as retrieved even if nobody else was waiting on it.
+    if not future.cancelled():
+        future.exception()
+
+
+async def _arun_fetch(key: str, future: asyncio.Future, fetch: Callable[[], Awaitable[object]], background: bool):
+    try:
+        # As in _run_fetch, reads inside the fetch aren't tracked.
+        token = _reads.set(None)
+        try:
+            value = await fetch()
+        finally:
+            _reads.reset(token)
+        if value is not None:
+            aset(key, value)
+        future.set_result(value)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        # Waiters get the error through the future.
+        future.set_exception(e)
+        if background:
+            logger.warning(f"Background refresh of {key} failed: {e}")
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _ainflight.pop(key, None)
+
+
+def _astart_fetch(key: str, fetch: Callable[[], Awaitable[object]], background: bool = False) -> asyncio.Future:
+    # The fetch runs in its own task, so cancelling whichever caller started
+    # it doesn't cancel it for everyone else awaiting the same key.
+    future = _ainflight[key] = asyncio.get_running_loop().create_future()
+    future.add_done_callback(_consume_error)
+    _spawn(_arun_fetch(key, future, fetch, background))
+    return future
+
+
+async def aget_or_fetch(
+    key: str,
+    ttl: int,
+    fetch: Callable[[], Awaitable[object]],
+    stale_ttl: int = 0,
+) -> object | None:
+    """Async version of get_or_fetch() for coroutine fetchers."""
+    value, fresh = await alookup(key, ttl, stale_ttl)
+    if fresh:
+        return value
+
+    future = _ainflight.get(key)
+    if value is not None:
+        if future is None:
+            _astart_fetch(key, fetch, background=True)
+        return value
+
+    if future is None:
+        future = _astart_fetch(key, fetch)
+    return await asyncio.shield(future)
+
+
+def delete(key: str):
+    with _lock:
+        _namespace(key).remove(key)
+    if _is_shared(key):
+        _shared_call("delete", key)
+
+
+def clear():
+    with _lock:
+        _namespaces.clear()
+    if _shared is not None:
+        _shared_call("clear")
+
+
+def stats() -> dict[str, dict]:
+    """Per-namespace entry counts, approximate bytes and hit/miss/eviction counters.
+
+    sharedHits counts misses here that were served by the shared backend.
+    """
     with _lock:
-        _cache[key] = (time.time(), value)
+        return {
+            name: {
+                "entries": len(ns.entries),
+                "bytes": ns.bytes,
+                "maxEntries": ns.max_entries,
+                "maxBytes": ns.max_bytes,
+                "hits": ns.hits,
+                "sharedHits": ns.shared_hits,
+                "misses": ns.misses,
+                "evictions": ns.evictions,
+                "expirations": ns.expirations,
+            }
+            for name, ns in _namespaces.items()
+        }
@@ -0,0 +1,116 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Shared second-level stores for cache.py, so several uvicorn workers (or
+# hosts) share fetched data instead of each calling Yahoo and SEC. Chosen
+# with CACHE_BACKEND:
+#   memory  per-process only (default)
+#   sqlite  one WAL-mode SQLite file shared by the processes on a host
+#   redis   any Redis-protocol server (CACHE_REDIS_URL); needs the redis package
+#
+# Values are pickled with protocol 5 together with the time they were
+# stored, so every worker applies the same TTLs to the same entry.
+
+PROTOCOL = 5
+SQLITE_PATH = Path(os.environ.get("CACHE_SQLITE_PATH", Path(__file__).parent / "data" / "cache.sqlite"))
+REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = "stock-platform:cache:"
+
+
+def _dumps(stored_at: float, value: object) -> bytes:
+    return pickle.dumps((stored_at, value), protocol=PROTOCOL)
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, path: Path = SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value BLOB NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> tuple[float, object] | None:
+        row = self._conn().execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key: str, stored_at: float, value: object, ttl: float):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                (key, stored_at + ttl, _dumps(stored_at, value)),
+            )
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
+
+    def sweep(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str = REDIS_URL):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)") from e
+        self.client = redis.Redis.from_url(url, socket_timeout=1)
+
+    def get(self, key: str) -> tuple[float, object] | None:
+        data = self.client.get(REDIS_PREFIX + key)
+        return pickle.loads(data) if data is not None else None
+
+    def set(self, key: str, stored_at: float, value: object, ttl: float):
+        remaining = stored_at + ttl - time.time()
+        if remaining > 0:
+            self.client.set(REDIS_PREFIX + key, _dumps(stored_at, value), px=int(remaining * 1000))
+
+    def delete(self, key: str):
+        self.client.delete(REDIS_PREFIX + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=REDIS_PREFIX + "*", count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+    def sweep(self):
+        pass  # Redis expires keys itself
+
+
+def from_env():
+    """The configured shared backend, or None for per-process caching only."""
+    name = os.environ.get("CACHE_BACKEND", "memory").lower()
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SqliteBackend()
+    if name == "redis":
+        return RedisBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {name!r} (expected memory, sqlite or redis)")
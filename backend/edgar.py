@@ -1,67 +1,325 @@
-import requests
+import asyncio
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import ijson
+import numpy as np
+
+import aio
 import cache
+import edgar_store
+
+logger = logging.getLogger(__name__)
 
 HEADERS = {"User-Agent": "EngeluStocks support@engelustocks.com"}
 BASE = "https://data.sec.gov"
 
-_cik_map: dict[str, int] | None = None
+# SEC's ticker list (ticker, CIK, company name, exchange), persisted as one
+# .npy file and memory-mapped, so every worker shares a single copy through
+# the page cache and a restart doesn't wait on sec.gov. The file holds two
+# sorted sections, one keyed by ticker and one by upper-cased company name,
+# which double as prefix indexes for local search.
+TICKERS_PATH = Path(os.environ.get("TICKERS_PATH", Path(__file__).parent / "data" / "sec_tickers.npy"))
+TICKERS_URL = "https://www.sec.gov/files/company_tickers_exchange.json"
+TICKERS_REFRESH = 86400
+BY_TICKER, BY_NAME = 0, 1
 
+_tickers: tuple | None = None  # (mtime_ns, table, {section: contiguous keys}, section bounds)
+_tickers_lock = threading.Lock()
+_refresh_lock = asyncio.Lock()
 
-def _load_cik_map() -> dict[str, int]:
-    global _cik_map
-    if _cik_map is not None:
-        return _cik_map
 
-    cached = cache.get("edgar:cik_map", ttl=86400)
-    if cached:
-        _cik_map = cached
-        return _cik_map
+def _build_tickers(data: dict) -> np.ndarray:
+    fields = data["fields"]
+    rows = [dict(zip(fields, row)) for row in data["data"] if row[fields.index("ticker")]]
+    tickers = [r["ticker"].upper().encode() for r in rows]
+    names = [(r["name"] or "").encode() for r in rows]
+    exchanges = [(r["exchange"] or "").encode() for r in rows]
+    ciks = [int(r["cik"]) for r in rows]
+    keys = tickers + [n.upper() for n in names]
 
-    resp = requests.get(
-        "https://www.sec.gov/files/company_tickers.json",
-        headers=HEADERS,
-        timeout=10,
-    )
-    resp.raise_for_status()
-    data = resp.json()
-    _cik_map = {entry["ticker"].upper(): entry["cik_str"] for entry in data.values()}
-    cache.set("edgar:cik_map", _cik_map)
-    return _cik_map
+    table = np.empty(2 * len(rows), dtype=[
+        ("section", "u1"),
+        ("key", np.array(keys).dtype),
+        ("ticker", np.array(tickers).dtype),
+        ("cik", "i8"),
+        ("name", np.array(names).dtype),
+        ("exchange", np.array(exchanges).dtype),
+    ])
+    table["section"] = [BY_TICKER] * len(rows) + [BY_NAME] * len(rows)
+    table["key"] = keys
+    table["ticker"] = tickers * 2
+    table["cik"] = ciks * 2
+    table["name"] = names * 2
+    table["exchange"] = exchanges * 2
+    table.sort(order=["section", "key"])
+    return table
+
+
+async def refresh_tickers(only_if_missing: bool = False):
+    """Download the ticker list and atomically replace the persisted copy."""
+    async with _refresh_lock:
+        if only_if_missing and TICKERS_PATH.exists():
+            return
+        resp = await aio.http().get(TICKERS_URL, headers=HEADERS, timeout=10)
+        resp.raise_for_status()
+        table = _build_tickers(resp.json())
+        TICKERS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = TICKERS_PATH.with_suffix(f".{os.getpid()}.tmp.npy")
+        np.save(tmp, table)
+        os.replace(tmp, TICKERS_PATH)
+        logger.info(f"Saved {len(table) // 2} SEC tickers to {TICKERS_PATH}")
+
+
+async def run_ticker_refresher():
+    """Keep the persisted ticker list at most a day old. Runs for the app's lifetime."""
+    while True:
+        try:
+            age = time.time() - TICKERS_PATH.stat().st_mtime
+        except FileNotFoundError:
+            age = TICKERS_REFRESH
+        if age >= TICKERS_REFRESH:
+            try:
+                await refresh_tickers()
+                age = 0
+            except Exception as e:
+                logger.warning(f"SEC ticker refresh failed: {e}")
+                age = TICKERS_REFRESH - 3600  # retry in an hour
+        await asyncio.sleep(TICKERS_REFRESH - age)
+
+
+def _ticker_table() -> tuple | None:
+    """(table, keys per section, bounds per section), reloaded when the file is replaced."""
+    global _tickers
+    try:
+        mtime = TICKERS_PATH.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _tickers_lock:
+        if _tickers is None or _tickers[0] != mtime:
+            table = np.load(TICKERS_PATH, mmap_mode="r")
+            split = int(np.searchsorted(table["section"], BY_NAME))
+            bounds = {BY_TICKER: (0, split), BY_NAME: (split, len(table))}
+            # Only the key column is copied (searchsorted needs it contiguous).
+            keys = {section: np.ascontiguousarray(table["key"][lo:hi]) for section, (lo, hi) in bounds.items()}
+            _tickers = (mtime, table, keys, bounds)
+        return _tickers[1:]
+
+
+def _prefix_range(tickers: tuple, section: int, prefix: bytes) -> tuple[int, int]:
+    """Positions within the section's keys that start with prefix."""
+    keys = tickers[1][section]
+    return int(np.searchsorted(keys, prefix)), int(np.searchsorted(keys, prefix + b"\xff"))
+
+
+async def resolve_cik(symbol: str) -> int | None:
+    tickers = _ticker_table()
+    if tickers is None:
+        # First run on this machine: wait for the initial download.
+        await refresh_tickers(only_if_missing=True)
+        tickers = _ticker_table()
+    table, keys, bounds = tickers
+    key = symbol.upper().encode()
+    i = int(np.searchsorted(keys[BY_TICKER], key))
+    if i < len(keys[BY_TICKER]) and keys[BY_TICKER][i] == key:
+        return int(table["cik"][bounds[BY_TICKER][0] + i])
+    return None
 
 
-def resolve_cik(symbol: str) -> int | None:
-    cik_map = _load_cik_map()
-    return cik_map.get(symbol.upper())
+def search_tickers(query: str, limit: int = 8) -> list[dict]:
+    """Ticker and company-name prefix matches from the local SEC list, best first.
 
+    Exact ticker first, then ticker prefixes (shortest first), then company
+    names starting with the query. Empty if the list isn't downloaded yet.
+    The SEC list doesn't say what kind of security a ticker is (stocks, ETFs
+    and trusts are all in it), so results carry no "type".
+    """
+    tickers = _ticker_table()
+    prefix = query.strip().upper().encode()
+    if tickers is None or not prefix:
+        return []
+    table, keys, bounds = tickers
 
-def get_company_facts(cik: int) -> dict | None:
-    cache_key = f"edgar:facts:{cik}"
-    cached = cache.get(cache_key, ttl=3600)
-    if cached:
-        return cached
+    lo, hi = _prefix_range(tickers, BY_TICKER, prefix)
+    matches = keys[BY_TICKER][lo:hi]
+    by_ticker = lo + np.lexsort((matches, np.char.str_len(matches)))[:limit]
+    lo, hi = _prefix_range(tickers, BY_NAME, prefix)
+    by_name = np.arange(lo, min(hi, lo + limit))
+    positions = [*(by_ticker + bounds[BY_TICKER][0]).tolist(), *(by_name + bounds[BY_NAME][0]).tolist()]
+
+    results = []
+    seen = set()
+    for i in positions:
+        row = table[i]
+        symbol = row["ticker"].decode()
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        results.append({
+            "symbol": symbol,
+            "name": row["name"].decode(),
+            "exchange": row["exchange"].decode(),
+        })
+        if len(results) >= limit:
+            break
+    return results
+
+
+async def get_company_facts(cik: int) -> dict | None:
+    """Indexed company facts (see index_facts), or None if EDGAR has none for this CIK."""
+    return await cache.aget_or_fetch(
+        f"edgar:facts:{cik}", 3600, lambda: _fetch_company_facts(cik), stale_ttl=86400
+    )
+
+
+async def _fetch_company_facts(cik: int) -> dict | None:
+    local = await aio.run_blocking(edgar_store.company_facts, cik)
+    if local is not None or edgar_store.OFFLINE:
+        return local
 
     url = f"{BASE}/api/xbrl/companyfacts/CIK{cik:010d}.json"
-    resp = requests.get(url, headers=HEADERS, timeout=15)
+    async with aio.http().stream("GET", url, headers=HEADERS) as resp:
+        if resp.status_code != 200:
+            return None
+        # Parse on the executor as the body arrives, keeping only
+        # CONCEPT_LABELS concepts, so memory is bounded by the largest kept
+        # concept rather than the filer's size.
+        reader = aio.BlockingReader(resp.aiter_bytes(), asyncio.get_running_loop())
+        return await aio.run_blocking(lambda: index_facts(parse_facts(reader)))
+
+
+async def get_submissions(cik: int) -> dict | None:
+    return await cache.aget_or_fetch(
+        f"edgar:subs:{cik}", 600, lambda: _fetch_submissions(cik), stale_ttl=3600
+    )
+
+
+async def _fetch_submissions(cik: int) -> dict | None:
+    local = await aio.run_blocking(edgar_store.submissions, cik)
+    if local is not None or edgar_store.OFFLINE:
+        return local
+
+    url = f"{BASE}/submissions/CIK{cik:010d}.json"
+    resp = await aio.http().get(url, headers=HEADERS)
     if resp.status_code != 200:
         return None
-    data = resp.json()
-    cache.set(cache_key, data)
-    return data
+    return resp.json()
 
 
-def get_submissions(cik: int) -> dict | None:
-    cache_key = f"edgar:subs:{cik}"
-    cached = cache.get(cache_key, ttl=600)
-    if cached:
-        return cached
+# Columns kept from submissions' filings.recent and its historical shards.
+FILING_COLUMNS = {
+    "form": "form",
+    "date": "filingDate",
+    "accession": "accessionNumber",
+    "document": "primaryDocument",
+    "description": "primaryDocDescription",
+}
+FIXED_WIDTH_COLUMNS = {"form", "accession"}
 
-    url = f"{BASE}/submissions/CIK{cik:010d}.json"
-    resp = requests.get(url, headers=HEADERS, timeout=15)
+
+async def get_filings_index(cik: int) -> dict | None:
+    """Every filing for a CIK as parallel numpy arrays (FILING_COLUMNS), newest first.
+
+    Built from the submissions JSON plus all of its `filings.files` shards.
+    """
+    return await cache.aget_or_fetch(
+        f"edgar:filings:{cik}", 600, lambda: _build_filings_index(cik), stale_ttl=3600
+    )
+
+
+async def _build_filings_index(cik: int) -> dict | None:
+    subs = await get_submissions(cik)
+    if not subs:
+        return None
+    filings = subs.get("filings", {})
+    names = [f["name"] for f in filings.get("files", [])]
+    shards = await asyncio.gather(*(_get_submissions_file(name) for name in names), return_exceptions=True)
+    # A missing older shard shouldn't cost the recent filings; the shard is
+    # retried when the index is next rebuilt.
+    blocks = [filings.get("recent", {})]
+    for name, shard in zip(names, shards):
+        if isinstance(shard, BaseException):
+            logger.warning(f"Skipping SEC submissions file {name}: {shard!r}")
+        elif shard:
+            blocks.append(shard)
+    return await aio.run_blocking(_index_filings, blocks)
+
+
+async def _get_submissions_file(name: str) -> dict | None:
+    async def fetch():
+        shard = await _fetch_submissions_file(name)
+        # Only the indexed columns are kept; the rest is most of a shard's size.
+        return {source: shard.get(source, []) for source in FILING_COLUMNS.values()} if shard else shard
+
+    # Shards only hold older filings and never change once published.
+    return await cache.aget_or_fetch(f"edgar_shard:{name}", 86400, fetch)
+
+
+async def _fetch_submissions_file(name: str) -> dict | None:
+    local = await aio.run_blocking(edgar_store.submissions_file, name)
+    if local is not None or edgar_store.OFFLINE:
+        return local
+
+    resp = await aio.http().get(f"{BASE}/submissions/{name}", headers=HEADERS)
     if resp.status_code != 200:
         return None
-    data = resp.json()
-    cache.set(cache_key, data)
-    return data
+    return resp.json()
+
+
+def _index_filings(blocks: list[dict]) -> dict[str, np.ndarray]:
+    columns = {name: [] for name in FILING_COLUMNS}
+    for block in blocks:
+        size = len(block.get("form", []))
+        for name, source in FILING_COLUMNS.items():
+            values = block.get(source, [])
+            columns[name].extend(values[:size] + [""] * (size - len(values)))
+
+    # Short fixed fields as fixed-width strings; free text as objects, since a
+    # <U array is as wide as its longest value in every row.
+    index = {
+        name: np.array(values, dtype=str if name in FIXED_WIDTH_COLUMNS else object)
+        for name, values in columns.items()
+    }
+    index["date"] = np.array(columns["date"], dtype="datetime64[D]")
+    order = np.argsort(index["date"], kind="stable")[::-1]
+    # NaT sorts last ascending, so first once reversed; put undated filings back at the end.
+    undated = np.isnat(index["date"][order])
+    order = np.concatenate([order[~undated], order[undated]])
+    return {name: values[order] for name, values in index.items()}
+
+
+def query_filings(
+    index: dict[str, np.ndarray],
+    cik: int,
+    forms: set[str] | None = None,
+    after: str | None = None,
+    before: str | None = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> dict:
+    """One page of filings matching the form set and inclusive YYYY-MM-DD date range."""
+    mask = np.ones(len(index["form"]), dtype=bool)
+    if forms:
+        mask &= np.isin(index["form"], list(forms))
+    if after:
+        mask &= index["date"] >= np.datetime64(after, "D")
+    if before:
+        mask &= index["date"] <= np.datetime64(before, "D")
+    matches = np.flatnonzero(mask)
+
+    filings = []
+    for i in matches[offset:offset + limit].tolist():
+        acc_raw = index["accession"][i].replace("-", "")
+        filings.append({
+            "form": str(index["form"][i]),
+            "date": str(index["date"][i]),
+            "description": str(index["description"][i]),
+            "url": f"https://www.sec.gov/Archives/edgar/data/{cik}/{acc_raw}/{index['document'][i]}",
+        })
+    return {"filings": filings, "total": len(matches), "offset": offset, "limit": limit}
 
 
 CONCEPT_LABELS = {
@@ -80,19 +338,30 @@ CONCEPT_LABELS = {
 }
 
 
-def extract_financials(facts: dict, period: str = "annual") -> dict:
-    """Parse companyfacts XBRL into { columns, rows } matching FinancialData format."""
-    us_gaap = facts.get("facts", {}).get("us-gaap", {})
-    if not us_gaap:
-        return {"columns": [], "rows": []}
+def parse_facts(f) -> dict:
+    """Stream companyfacts JSON from a binary file, keeping only CONCEPT_LABELS concepts."""
+    kept = {
+        concept: data
+        for concept, data in ijson.kvitems(f, "facts.us-gaap", use_float=True)
+        if concept in CONCEPT_LABELS
+    }
+    return {"facts": {"us-gaap": kept}}
 
-    form_filter = "10-K" if period == "annual" else "10-Q"
 
-    # Collect data for each concept
-    rows_map: dict[str, dict[str, float]] = {}
-    all_periods: set[str] = set()
+# One row per 10-K/10-Q fact of a CONCEPT_LABELS concept, in filing order.
+FACT_DTYPE = np.dtype([("form", "U4"), ("fy", "i4"), ("end", "U10"), ("val", "f8")])
+FORMS = {"annual": "10-K", "quarterly": "10-Q"}
 
-    for concept, label in CONCEPT_LABELS.items():
+
+def index_facts(facts: dict) -> dict:
+    """Reduce raw companyfacts JSON to what /sec-financials needs.
+
+    Returns {"concepts": {concept: FACT_DTYPE array}, "annual": ..., "quarterly": ...}
+    with both statements already extracted, so the raw JSON can be dropped.
+    """
+    us_gaap = facts.get("facts", {}).get("us-gaap", {})
+    concepts = {}
+    for concept in CONCEPT_LABELS:
         concept_data = us_gaap.get(concept)
         if not concept_data:
             continue
@@ -101,26 +370,50 @@ def extract_financials(facts: dict, period: str = "annual") -> dict:
         # Try USD first, then USD/shares for EPS
         values_list = units.get("USD") or units.get("USD/shares") or []
 
-        period_values: dict[str, float] = {}
-        for entry in values_list:
-            form = entry.get("form", "")
-            if form != form_filter:
-                continue
-            # Use entries with 'end' date and a fiscal year
-            end = entry.get("end", "")
-            fy = entry.get("fy")
-            if not end or fy is None:
-                continue
-
-            # For annual, use the fiscal year; for quarterly, use end date quarter
-            if period == "annual":
-                key = str(fy)
-            else:
-                key = end[:7]  # YYYY-MM
-
-            val = entry.get("val")
-            if val is not None:
-                period_values[key] = val
+        rows = [
+            (entry["form"], entry["fy"], entry["end"], entry["val"])
+            for entry in values_list
+            if entry.get("form") in FORMS.values()
+            and entry.get("end")
+            and entry.get("fy") is not None
+            and entry.get("val") is not None
+        ]
+        if rows:
+            concepts[concept] = np.array(rows, dtype=FACT_DTYPE)
+
+    return {
+        "concepts": concepts,
+        "annual": _extract(concepts, "annual"),
+        "quarterly": _extract(concepts, "quarterly"),
+    }
+
+
+def extract_financials(facts: dict, period: str = "annual") -> dict:
+    """{ columns, rows } in FinancialData format from indexed company facts."""
+    return facts["annual" if period == "annual" else "quarterly"]
+
+
+def _extract(concepts: dict[str, np.ndarray], period: str) -> dict:
+    form_filter = FORMS[period]
+
+    # Collect data for each concept
+    rows_map: dict[str, dict[str, float]] = {}
+    all_periods: set[str] = set()
+
+    for concept, label in CONCEPT_LABELS.items():
+        facts = concepts.get(concept)
+        if facts is None:
+            continue
+        facts = facts[facts["form"] == form_filter]
+
+        # For annual, use the fiscal year; for quarterly, use end date quarter
+        if period == "annual":
+            keys = facts["fy"].astype(str).tolist()
+        else:
+            keys = [end[:7] for end in facts["end"].tolist()]  # YYYY-MM
+
+        # Later filings win within a concept
+        period_values = dict(zip(keys, (_number(v) for v in facts["val"].tolist())))
 
         if period_values:
             # Merge with existing data — earlier concepts don't overwrite later ones
@@ -150,3 +443,8 @@ def extract_financials(facts: dict, period: str = "annual") -> dict:
         rows.append({"label": label, "values": values})
 
     return {"columns": columns, "rows": rows}
+
+
+def _number(value: float) -> int | float:
+    # XBRL dollar amounts are integers; keep them that way in the JSON.
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,105 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+# Local copy of SEC's nightly bulk archives (companyfacts.zip and
+# submissions.zip), loaded by ingest_edgar.py into one SQLite file keyed by
+# CIK. edgar.py reads from here first and only goes to data.sec.gov for
+# companies that are missing or whose snapshot is older than MAX_AGE.
+DB_PATH = Path(os.environ.get("EDGAR_DB", Path(__file__).parent / "data" / "edgar.sqlite"))
+MAX_AGE = float(os.environ.get("EDGAR_SNAPSHOT_MAX_AGE", str(36 * 3600)))
+# Serve whatever the snapshot has, however old, and never call the live API.
+OFFLINE = os.environ.get("EDGAR_OFFLINE", "") == "1"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facts (
+    cik INTEGER PRIMARY KEY,
+    snapshot REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    cik INTEGER PRIMARY KEY,
+    snapshot REAL NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS submission_files (
+    name TEXT PRIMARY KEY,
+    cik INTEGER NOT NULL,
+    snapshot REAL NOT NULL,
+    data BLOB NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _conn() -> sqlite3.Connection | None:
+    """Per-thread connection, or None if nothing has been ingested."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        if not DB_PATH.exists():
+            return None
+        conn = sqlite3.connect(DB_PATH)
+        _local.conn = conn
+    return conn
+
+
+def connect_for_writes() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _read(table: str, key_column: str, key) -> bytes | None:
+    conn = _conn()
+    if conn is None:
+        return None
+    try:
+        row = conn.execute(
+            f"SELECT snapshot, data FROM {table} WHERE {key_column} = ?", (key,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        # Table not there yet (e.g. only one archive was ingested).
+        return None
+    if row is None:
+        return None
+    snapshot, data = row
+    if not OFFLINE and time.time() - snapshot > MAX_AGE:
+        return None
+    return data
+
+
+def company_facts(cik: int) -> dict | None:
+    """Indexed company facts (edgar.index_facts output) from the snapshot."""
+    data = _read("facts", "cik", cik)
+    return pickle.loads(data) if data is not None else None
+
+
+def submissions(cik: int) -> dict | None:
+    data = _read("submissions", "cik", cik)
+    return decode_json(data) if data is not None else None
+
+
+def submissions_file(name: str) -> dict | None:
+    """One older-filings shard (a `filings.files` entry such as CIK0000320193-submissions-001.json)."""
+    data = _read("submission_files", "name", name)
+    return decode_json(data) if data is not None else None
+
+
+def encode_facts(indexed: dict) -> bytes:
+    return pickle.dumps(indexed, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def encode_json(obj: dict) -> bytes:
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode())
+
+
+def decode_json(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
@@ -0,0 +1,141 @@
+import gzip
+import hashlib
+import time
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import aio
+import cache
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Validators, freshness and compression for GET responses.
+#
+# The ETag is derived from the versions (store times) of the cache entries
+# the route read, so a repeat request for unchanged data is answered with
+# 304 and no body. Routes that read nothing cached, or awaited a fetch
+# started by another request, fall back to a hash of the body.
+#
+# Cache-Control max-age is the time left before the first of those entries
+# goes stale, i.e. the route's existing server-side TTL. Routes that set
+# their own Cache-Control (e.g. data the user edits) keep it.
+#
+# Event streams pass through untouched.
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+# Larger bodies are compressed off the event loop.
+COMPRESS_THREAD_SIZE = 256 * 1024
+
+
+def _etag(scope: Scope, content_type: str, reads: dict, body: bytes) -> str:
+    digest = hashlib.blake2b(digest_size=12)
+    if reads and all(stored_at is not None for stored_at, _ in reads.values()):
+        digest.update(f"{scope['path']}?{scope['query_string'].decode()}|{content_type}".encode())
+        for key in sorted(reads):
+            digest.update(f"|{key}@{reads[key][0]!r}".encode())
+    else:
+        digest.update(body)
+    # Weak, so it also matches the compressed form of the same body.
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _max_age(reads: dict) -> int | None:
+    now = time.time()
+    remaining = [ttl - (now - stored_at) for stored_at, ttl in reads.values() if stored_at is not None and ttl]
+    if not remaining:
+        return None
+    return max(0, int(min(remaining)))
+
+
+def _matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def _encoding(accept_encoding: str) -> str | None:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class HTTPCacheMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        start: Message | None = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def capture(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                content_type = Headers(raw=message["headers"]).get("content-type", "")
+                if message["status"] != 200 or content_type.startswith("text/event-stream"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+            else:
+                chunks.append(message.get("body", b""))
+
+        with cache.track() as reads:
+            await self.app(scope, receive, capture)
+        if passthrough or start is None:
+            return
+        await self._respond(scope, start, b"".join(chunks), reads, send)
+
+    async def _respond(self, scope: Scope, start: Message, body: bytes, reads: dict, send: Send):
+        request_headers = Headers(scope=scope)
+        headers = MutableHeaders(raw=list(start["headers"]))
+        etag = headers.get("etag") or _etag(scope, headers.get("content-type", ""), reads, body)
+        headers["ETag"] = etag
+        if "cache-control" not in headers:
+            max_age = _max_age(reads)
+            headers["Cache-Control"] = f"max-age={max_age}" if max_age else "no-cache"
+
+        if _matches(request_headers.get("if-none-match"), etag):
+            for name in ("content-length", "content-type"):
+                if name in headers:
+                    del headers[name]
+            await send({"type": "http.response.start", "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if len(body) >= COMPRESS_MIN_SIZE and "content-encoding" not in headers:
+            headers.add_vary_header("Accept-Encoding")
+            encoding = _encoding(request_headers.get("accept-encoding", ""))
+            if encoding:
+                if len(body) >= COMPRESS_THREAD_SIZE:
+                    body = await aio.run_blocking(_compress, body, encoding)
+                else:
+                    body = _compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+
+        await send({**start, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": body})
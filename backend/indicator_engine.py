@@ -0,0 +1,408 @@
+import math
+import threading
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Stateful, O(1)-per-bar versions of the batch indicators in
+# routers/indicators.py. Every building block keeps "committed" state for
+# all bars except the latest one, so the latest bar can be revised any
+# number of times (a live intraday candle) before the next bar commits it.
+#
+# Outputs match the batch implementations: the same warm-up NaNs, simple
+# (not Wilder) averaging for RSI, sample standard deviation for Bollinger
+# Bands, and a VWAP that is cumulative over the whole series.
+
+NAN = float("nan")
+
+
+class _RollingSum:
+    """Sum over the last `window` values; NaN until full or while a NaN is in the window."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque[float] = deque()
+        self.total = 0.0
+        self.nans = 0
+
+    def peek(self, x: float) -> float:
+        if len(self.values) < self.window - 1:
+            return NAN
+        if self.nans or math.isnan(x):
+            return NAN
+        return self.total + x
+
+    def commit(self, x: float):
+        self.values.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.total += x
+        if len(self.values) > self.window - 1:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+
+
+class _RollingVariance:
+    """Sliding-window mean and sample variance via Welford's add/remove updates.
+
+    NaN until full or while a NaN is in the window, like _RollingSum.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values: deque[float] = deque()
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.nans = 0
+
+    @staticmethod
+    def _add(n: int, mean: float, m2: float, x: float) -> tuple[float, float]:
+        delta = x - mean
+        mean += delta / n
+        return mean, m2 + delta * (x - mean)
+
+    def peek(self, x: float) -> tuple[float, float]:
+        n = len(self.values) + 1
+        if n < self.window or self.window < 2:
+            return NAN, NAN
+        if self.nans or math.isnan(x):
+            return NAN, NAN
+        mean, m2 = self._add(n, self.mean, self.m2, x)
+        return mean, max(m2, 0.0) / (n - 1)
+
+    def commit(self, x: float):
+        self.values.append(x)
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.count += 1
+            self.mean, self.m2 = self._add(self.count, self.mean, self.m2, x)
+        if len(self.values) > self.window - 1:
+            old = self.values.popleft()
+            if math.isnan(old):
+                self.nans -= 1
+                return
+            self.count -= 1
+            if self.count == 0:
+                self.mean, self.m2 = 0.0, 0.0
+            else:
+                delta = old - self.mean
+                self.mean -= delta / self.count
+                self.m2 -= delta * (old - self.mean)
+
+
+class _RollingExtreme:
+    """Rolling min or max over `window` values using a monotonic deque; NaN while a NaN is in the window."""
+
+    def __init__(self, window: int, is_max: bool):
+        self.window = window
+        self.is_max = is_max
+        self.queue: deque[tuple[int, float]] = deque()
+        self.count = 0
+        self.last_nan = -window
+
+    def _better(self, a: float, b: float) -> bool:
+        return a >= b if self.is_max else a <= b
+
+    def peek(self, x: float) -> float:
+        if self.count < self.window - 1:
+            return NAN
+        if math.isnan(x) or self.last_nan > self.count - self.window:
+            return NAN
+        if not self.queue:
+            return x
+        front = self.queue[0][1]
+        return x if self._better(x, front) else front
+
+    def commit(self, x: float):
+        if math.isnan(x):
+            # Kept out of the deque, where it would break the comparisons.
+            self.last_nan = self.count
+        else:
+            while self.queue and self._better(x, self.queue[-1][1]):
+                self.queue.pop()
+            self.queue.append((self.count, x))
+        self.count += 1
+        # Keep the last window - 1 committed values; the pending bar fills the window.
+        while self.queue and self.queue[0][0] <= self.count - self.window:
+            self.queue.popleft()
+
+
+class _Ema:
+    """Recursive EMA matching pandas ewm(span=..., adjust=False).
+
+    As in pandas, a NaN input repeats the previous value and the next input
+    is weighted against an older average.
+    """
+
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.value: float | None = None
+        self.old_weight = 1.0
+
+    def peek(self, x: float) -> float:
+        if self.value is None:
+            return x
+        if math.isnan(x):
+            return self.value
+        old_weight = self.old_weight * (1 - self.alpha)
+        return (old_weight * self.value + self.alpha * x) / (old_weight + self.alpha)
+
+    def commit(self, x: float):
+        if math.isnan(x):
+            if self.value is not None:
+                self.old_weight *= 1 - self.alpha
+            return
+        self.value = self.peek(x)
+        self.old_weight = 1.0
+
+
+class Sma:
+    fields = ("value",)
+
+    def __init__(self, period: int):
+        self.period = period
+        self.sum = _RollingSum(period)
+
+    def peek(self, bar):
+        return (self.sum.peek(bar[3]) / self.period,)
+
+    def commit(self, bar):
+        self.sum.commit(bar[3])
+
+
+class Ema:
+    fields = ("value",)
+
+    def __init__(self, period: int):
+        self.ema = _Ema(period)
+
+    def peek(self, bar):
+        return (self.ema.peek(bar[3]),)
+
+    def commit(self, bar):
+        self.ema.commit(bar[3])
+
+
+class Rsi:
+    fields = ("value",)
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close: float | None = None
+        self.gains = _RollingSum(period)
+        self.losses = _RollingSum(period)
+
+    def _gain_loss(self, close: float) -> tuple[float, float]:
+        if self.prev_close is None:
+            return 0.0, 0.0
+        delta = close - self.prev_close
+        return (delta, 0.0) if delta > 0 else (0.0, -delta if delta < 0 else 0.0)
+
+    def peek(self, bar):
+        gain, loss = self._gain_loss(bar[3])
+        avg_gain = self.gains.peek(gain) / self.period
+        avg_loss = self.losses.peek(loss) / self.period
+        if math.isnan(avg_gain) or math.isnan(avg_loss):
+            return (NAN,)
+        if avg_loss == 0:
+            return (100.0 if avg_gain > 0 else NAN,)
+        return (100 - 100 / (1 + avg_gain / avg_loss),)
+
+    def commit(self, bar):
+        gain, loss = self._gain_loss(bar[3])
+        self.gains.commit(gain)
+        self.losses.commit(loss)
+        self.prev_close = bar[3]
+
+
+class Macd:
+    fields = ("macd", "signal", "histogram")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = _Ema(fast)
+        self.slow = _Ema(slow)
+        self.signal = _Ema(signal)
+
+    def peek(self, bar):
+        line = self.fast.peek(bar[3]) - self.slow.peek(bar[3])
+        signal = self.signal.peek(line)
+        return line, signal, line - signal
+
+    def commit(self, bar):
+        line = self.fast.peek(bar[3]) - self.slow.peek(bar[3])
+        self.fast.commit(bar[3])
+        self.slow.commit(bar[3])
+        self.signal.commit(line)
+
+
+class BBands:
+    fields = ("upper", "middle", "lower")
+
+    def __init__(self, period: int = 20, std_dev: float = 2):
+        self.std_dev = std_dev
+        self.var = _RollingVariance(period)
+
+    def peek(self, bar):
+        mean, var = self.var.peek(bar[3])
+        std = math.sqrt(var) if not math.isnan(var) else NAN
+        return mean + self.std_dev * std, mean, mean - self.std_dev * std
+
+    def commit(self, bar):
+        self.var.commit(bar[3])
+
+
+class Vwap:
+    fields = ("value",)
+
+    def __init__(self):
+        self.tp_volume = 0.0
+        self.volume = 0.0
+
+    def peek(self, bar):
+        _, high, low, close, volume = bar
+        tp_volume = (high + low + close) / 3 * volume
+        total_volume = self.volume + volume
+        if math.isnan(tp_volume) or math.isnan(total_volume) or total_volume == 0:
+            return (NAN,)
+        return ((self.tp_volume + tp_volume) / total_volume,)
+
+    def commit(self, bar):
+        # NaNs are skipped, as by the batch cumsum().
+        _, high, low, close, volume = bar
+        tp_volume = (high + low + close) / 3 * volume
+        if not math.isnan(tp_volume):
+            self.tp_volume += tp_volume
+        if not math.isnan(volume):
+            self.volume += volume
+
+
+class Stochastic:
+    fields = ("k", "d")
+
+    def __init__(self, k_period: int = 14, d_period: int = 3):
+        self.lowest = _RollingExtreme(k_period, is_max=False)
+        self.highest = _RollingExtreme(k_period, is_max=True)
+        self.d_sum = _RollingSum(d_period)
+        self.d_period = d_period
+
+    def _k(self, bar) -> float:
+        low = self.lowest.peek(bar[2])
+        high = self.highest.peek(bar[1])
+        span = high - low
+        if math.isnan(span) or span == 0:
+            return NAN
+        return 100 * (bar[3] - low) / span
+
+    def peek(self, bar):
+        k = self._k(bar)
+        return k, self.d_sum.peek(k) / self.d_period
+
+    def commit(self, bar):
+        k = self._k(bar)
+        self.lowest.commit(bar[2])
+        self.highest.commit(bar[1])
+        self.d_sum.commit(k)
+
+
+def make_indicator(name: str):
+    """Build the incremental indicator for a /api/indicators name, or None if unknown."""
+    if name.startswith("sma_"):
+        return Sma(int(name.split("_")[1]))
+    if name.startswith("ema_"):
+        return Ema(int(name.split("_")[1]))
+    return {
+        "rsi": Rsi,
+        "macd": Macd,
+        "bbands": BBands,
+        "vwap": Vwap,
+        "stoch": Stochastic,
+    }.get(name, lambda: None)()
+
+
+class IndicatorEngine:
+    """Incremental indicators over one bar series, with the full output history."""
+
+    def __init__(self, names: list[str]):
+        self.indicators = {}
+        for name in names:
+            indicator = make_indicator(name)
+            if indicator is not None:
+                self.indicators[name] = indicator
+        self.outputs = {name: {f: [] for f in ind.fields} for name, ind in self.indicators.items()}
+        self.times: list[int] = []
+        self.pending: tuple | None = None
+
+    def update(self, time: int, bar: tuple[float, float, float, float, float]):
+        """Feed one (open, high, low, close, volume) bar. A repeated time revises the last bar."""
+        revise = bool(self.times) and time == self.times[-1]
+        if not revise:
+            if self.pending is not None:
+                for indicator in self.indicators.values():
+                    indicator.commit(self.pending)
+            self.times.append(time)
+        self.pending = bar
+
+        for name, indicator in self.indicators.items():
+            out = self.outputs[name]
+            for field, value in zip(indicator.fields, indicator.peek(bar)):
+                if revise:
+                    out[field][-1] = value
+                else:
+                    out[field].append(value)
+
+    def series(self, name: str) -> dict[str, np.ndarray]:
+        return {field: np.asarray(values, dtype="f8") for field, values in self.outputs[name].items()}
+
+
+# One engine per (symbol, interval), least recently used dropped first.
+MAX_ENGINES = 500
+_engines: OrderedDict[tuple[str, str], IndicatorEngine] = OrderedDict()
+_lock = threading.Lock()
+
+
+def sync(symbol: str, interval: str, hist, names: list[str]) -> tuple[np.ndarray, dict[str, dict[str, np.ndarray]]]:
+    """Bring the engine for (symbol, interval) up to date with hist.
+
+    Returns (bar times in epoch ns, {name: {field: values}}) for the known
+    names, copied under the lock so a concurrent sync can't grow them
+    afterwards. Only bars from the engine's last bar onwards are fed. The
+    engine is rebuilt when hist starts at a different bar (e.g. a new
+    session), doesn't extend what the engine has seen, or needs new
+    indicators.
+    """
+    times = hist.index.as_unit("ns").asi8
+    key = (symbol.upper(), interval)
+    with _lock:
+        engine = _engines.get(key)
+        if engine is not None:
+            _engines.move_to_end(key)
+        start = None
+        if (
+            engine is not None
+            and engine.times
+            and len(times)
+            and times[0] == engine.times[0]
+            and all(n in engine.indicators for n in names if make_indicator(n) is not None)
+        ):
+            start = int(np.searchsorted(times, engine.times[-1]))
+            if start >= len(times) or times[start] != engine.times[-1]:
+                start = None
+        if start is None:
+            wanted = set(names) | (set(engine.indicators) if engine is not None else set())
+            engine = IndicatorEngine(sorted(wanted))
+            start = 0
+            _engines[key] = engine
+            while len(_engines) > MAX_ENGINES:
+                _engines.popitem(last=False)
+
+        columns = hist[["Open", "High", "Low", "Close", "Volume"]].iloc[start:].to_numpy(dtype="f8")
+        for time, bar in zip(times[start:].tolist(), columns.tolist()):
+            engine.update(time, tuple(bar))
+        series = {name: engine.series(name) for name in names if name in engine.indicators}
+        return np.array(engine.times, dtype="i8"), series
@@ -0,0 +1,96 @@
+"""Load SEC bulk archives into the local EDGAR store.
+
+    python ingest_edgar.py --companyfacts companyfacts.zip --submissions submissions.zip
+
+Archives come from https://www.sec.gov/Archives/edgar/daily-index/bulkdata/
+(refreshed nightly). Either flag may be given on its own; re-running
+replaces the companies present in the archive. The archive's modification
+time is recorded as the snapshot time.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import zipfile
+
+import edgar
+import edgar_store
+
+BATCH = 500
+MEMBER_RE = re.compile(r"CIK(\d{10})(-submissions-\d+)?\.json$")
+
+
+def _members(path: str, parse=json.load):
+    """Yield (cik, member name, shard suffix or None, parsed JSON) for every CIK file in the archive."""
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            match = MEMBER_RE.search(info.filename)
+            if not match:
+                continue
+            with archive.open(info) as f:
+                yield int(match.group(1)), os.path.basename(info.filename), match.group(2), parse(f)
+
+
+def ingest_company_facts(path: str) -> int:
+    snapshot = os.path.getmtime(path)
+    conn = edgar_store.connect_for_writes()
+    count = 0
+    batch = []
+    for cik, _, _, facts in _members(path, parse=edgar.parse_facts):
+        batch.append((cik, snapshot, edgar_store.encode_facts(edgar.index_facts(facts))))
+        if len(batch) >= BATCH:
+            count += _flush(conn, "INSERT OR REPLACE INTO facts VALUES (?, ?, ?)", batch)
+    count += _flush(conn, "INSERT OR REPLACE INTO facts VALUES (?, ?, ?)", batch)
+    conn.close()
+    return count
+
+
+def ingest_submissions(path: str) -> int:
+    snapshot = os.path.getmtime(path)
+    conn = edgar_store.connect_for_writes()
+    count = 0
+    main, shards = [], []
+    for cik, name, shard, data in _members(path):
+        if shard:
+            shards.append((name, cik, snapshot, edgar_store.encode_json(data)))
+        else:
+            main.append((cik, snapshot, edgar_store.encode_json(data)))
+        if len(main) >= BATCH:
+            count += _flush(conn, "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?)", main)
+        if len(shards) >= BATCH:
+            _flush(conn, "INSERT OR REPLACE INTO submission_files VALUES (?, ?, ?, ?)", shards)
+    count += _flush(conn, "INSERT OR REPLACE INTO submissions VALUES (?, ?, ?)", main)
+    _flush(conn, "INSERT OR REPLACE INTO submission_files VALUES (?, ?, ?, ?)", shards)
+    conn.close()
+    return count
+
+
+def _flush(conn, sql: str, rows: list) -> int:
+    count = len(rows)
+    if rows:
+        with conn:
+            conn.executemany(sql, rows)
+        rows.clear()
+        print(f"  {count} written", file=sys.stderr)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--companyfacts", help="path to companyfacts.zip")
+    parser.add_argument("--submissions", help="path to submissions.zip")
+    args = parser.parse_args()
+    if not args.companyfacts and not args.submissions:
+        parser.error("give --companyfacts and/or --submissions")
+
+    if args.companyfacts:
+        print(f"Ingesting {args.companyfacts} into {edgar_store.DB_PATH}", file=sys.stderr)
+        print(f"{ingest_company_facts(args.companyfacts)} companies with facts", file=sys.stderr)
+    if args.submissions:
+        print(f"Ingesting {args.submissions} into {edgar_store.DB_PATH}", file=sys.stderr)
+        print(f"{ingest_submissions(args.submissions)} companies with submissions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
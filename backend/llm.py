@@ -0,0 +1,162 @@
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import anthropic
+
+# Every Anthropic call in the app shares one client (and so one pooled
+# connection set) and goes through the same gate: at most MAX_CONCURRENCY
+# requests in flight, started no faster than REQUESTS_PER_MINUTE. Bursts
+# wait their turn here, in arrival order, instead of hitting upstream 429s.
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = float(os.environ.get("LLM_REQUESTS_PER_MINUTE", "50"))
+BURST = int(os.environ.get("LLM_BURST", "10"))
+MAX_RETRIES = 2
+
+# Latency percentiles are computed over this many recent calls.
+LATENCY_WINDOW = 500
+
+_client: anthropic.AsyncAnthropic | None = None
+
+
+def client() -> anthropic.AsyncAnthropic:
+    global _client
+    if _client is None:
+        _client = anthropic.AsyncAnthropic(
+            api_key=os.environ.get("ANTHROPIC_API_KEY"),
+            max_retries=MAX_RETRIES,
+        )
+    return _client
+
+
+def start():
+    """Create the client up front so the first request doesn't pay for it."""
+    client()
+
+
+async def aclose():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+class TokenBucket:
+    """Request-rate limiter: `rate` tokens per second, up to `capacity` saved up."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        # asyncio.Lock wakes waiters in FIFO order, which keeps the queue fair.
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+_bucket = TokenBucket(REQUESTS_PER_MINUTE / 60, BURST)
+
+_waiting = 0
+_in_flight = 0
+_requests = 0
+_errors = 0
+_waits: deque[float] = deque(maxlen=LATENCY_WINDOW)
+_latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+
+class QueueTimeout(Exception):
+    """Gave up waiting for a slot; the request was never sent."""
+
+
+@asynccontextmanager
+async def slot(queue_timeout: float | None = None):
+    """Hold one concurrency slot and one rate token for the duration of a call.
+
+    Raises QueueTimeout if none is free within queue_timeout seconds.
+    """
+    global _waiting, _in_flight, _requests, _errors
+    queued_at = time.monotonic()
+    _waiting += 1
+    try:
+        async with asyncio.timeout(queue_timeout):
+            await _semaphore.acquire()
+            try:
+                await _bucket.acquire()
+            except BaseException:
+                _semaphore.release()
+                raise
+    except TimeoutError:
+        raise QueueTimeout(f"No LLM slot free after {queue_timeout:g}s") from None
+    finally:
+        _waiting -= 1
+
+    started = time.monotonic()
+    _waits.append(started - queued_at)
+    _in_flight += 1
+    _requests += 1
+    try:
+        yield
+    except BaseException:
+        _errors += 1
+        raise
+    finally:
+        _in_flight -= 1
+        _latencies.append(time.monotonic() - started)
+        _semaphore.release()
+
+
+async def create(*, call_timeout: float | None = None, queue_timeout: float | None = None, **kwargs):
+    """messages.create through the shared client and gate.
+
+    call_timeout (TimeoutError) starts once the slot is held; time spent
+    queued is bounded by queue_timeout (QueueTimeout) instead.
+    """
+    async with slot(queue_timeout):
+        async with asyncio.timeout(call_timeout):
+            return await client().messages.create(**kwargs)
+
+
+@asynccontextmanager
+async def stream(*, call_timeout: float | None = None, queue_timeout: float | None = None, **kwargs):
+    """messages.stream through the shared client; the slot is held until the stream closes.
+
+    Timeouts as for create(); call_timeout covers consuming the stream too.
+    """
+    async with slot(queue_timeout):
+        async with asyncio.timeout(call_timeout):
+            async with client().messages.stream(**kwargs) as response:
+                yield response
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def stats() -> dict:
+    latencies = sorted(_latencies)
+    waits = sorted(_waits)
+    return {
+        "maxConcurrency": MAX_CONCURRENCY,
+        "requestsPerMinute": REQUESTS_PER_MINUTE,
+        "queued": _waiting,
+        "inFlight": _in_flight,
+        "requests": _requests,
+        "errors": _errors,
+        "latency": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95)},
+        "queueWait": {"p50": _percentile(waits, 0.5), "p95": _percentile(waits, 0.95)},
+    }
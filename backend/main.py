@@ -1,11 +1,30 @@
 from dotenv import load_dotenv
 load_dotenv()
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import aio
+import cache
+import edgar
+import http_cache
+import llm
+from responses import ORJSONResponse
 from routers import market, agent, indicators, fundamentals, news, portfolio
 
-app = FastAPI(title="Stock Platform API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    llm.start()
+    ticker_refresher = asyncio.create_task(edgar.run_ticker_refresher())
+    yield
+    ticker_refresher.cancel()
+    await llm.aclose()
+    await aio.aclose()
+
+
+app = FastAPI(title="Stock Platform API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +32,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(http_cache.HTTPCacheMiddleware)
 
 app.include_router(market.router, prefix="/api")
 app.include_router(agent.router, prefix="/api")
@@ -20,3 +40,13 @@ app.include_router(indicators.router, prefix="/api")
 app.include_router(fundamentals.router, prefix="/api")
 app.include_router(news.router, prefix="/api")
 app.include_router(portfolio.router, prefix="/api")
+
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return cache.stats()
+
+
+@app.get("/api/llm/stats")
+def llm_stats():
+    return llm.stats()
@@ -0,0 +1,163 @@
+import logging
+
+import pandas as pd
+import yfinance as yf
+import cache
+
+logger = logging.getLogger(__name__)
+
+# yfinance's ticker.info is one of the slowest upstream calls, so every
+# router projects what it needs from one shared snapshot per symbol.
+INFO_TTL = 60
+INFO_STALE_TTL = 300
+
+QUOTE_TTL = 60
+QUOTE_STALE_TTL = 300
+QUOTE_FIELDS = (
+    "symbol", "price", "change", "changePercent", "high", "low", "volume",
+    "extPrice", "extChange", "extChangePercent", "extLabel",
+)
+MAX_BATCH_SYMBOLS = 200
+
+
+def get_info(symbol: str, refresh: bool = False) -> dict:
+    """Return the shared ticker.info snapshot for symbol ({} if unavailable)."""
+    cache_key = f"info:{symbol.upper()}"
+    if refresh:
+        cache.delete(cache_key)
+    info = cache.get_or_fetch(cache_key, INFO_TTL, lambda: _fetch_info(symbol), stale_ttl=INFO_STALE_TTL)
+    return info or {}
+
+
+def _fetch_info(symbol: str) -> dict | None:
+    info = yf.Ticker(symbol).info
+    return info or None
+
+
+def get_quote(symbol: str, refresh: bool = False) -> dict | None:
+    """Return the quote for symbol, projected from its info snapshot."""
+    cache_key = f"quote:{symbol.upper()}"
+    if refresh:
+        get_info(symbol, refresh=True)
+        cache.delete(cache_key)
+    return cache.get_or_fetch(cache_key, QUOTE_TTL, lambda: _fetch_quote(symbol), stale_ttl=QUOTE_STALE_TTL)
+
+
+def _fetch_quote(symbol: str) -> dict | None:
+    info = get_info(symbol)
+
+    if not info or "regularMarketPrice" not in info:
+        return None
+
+    price = info.get("regularMarketPrice", 0)
+    prev_close = info.get("regularMarketPreviousClose", price)
+    change = round(price - prev_close, 2)
+    change_pct = round((change / prev_close) * 100, 2) if prev_close else 0
+
+    # Extended hours data
+    market_state = info.get("marketState", "")
+    ext_price = None
+    ext_change = None
+    ext_change_pct = None
+    ext_label = None
+
+    if market_state in ("PRE", "PREPRE") and info.get("preMarketPrice") is not None:
+        ext_price = round(info["preMarketPrice"], 2)
+        ext_change = round(info.get("preMarketChange", 0), 2)
+        ext_change_pct = round(info.get("preMarketChangePercent", 0), 2)
+        ext_label = "Pre-Market"
+    elif market_state in ("POST", "POSTPOST", "CLOSED") and info.get("postMarketPrice") is not None:
+        ext_price = round(info["postMarketPrice"], 2)
+        ext_change = round(info.get("postMarketChange", 0), 2)
+        ext_change_pct = round(info.get("postMarketChangePercent", 0), 2)
+        ext_label = "After Hours" if market_state == "POST" else "Post-Market"
+
+    result = {
+        "symbol": symbol.upper(),
+        "price": price,
+        "change": change,
+        "changePercent": change_pct,
+        "high": info.get("regularMarketDayHigh", 0),
+        "low": info.get("regularMarketDayLow", 0),
+        "volume": info.get("regularMarketVolume", 0),
+        "extPrice": ext_price,
+        "extChange": ext_change,
+        "extChangePercent": ext_change_pct,
+        "extLabel": ext_label,
+    }
+    return result
+
+
+def get_quotes(symbols: list[str], timeout: float = 10) -> dict[str, dict]:
+    """Return {symbol: quote} for every symbol that could be priced.
+
+    Symbols with a cached quote are served from it; the rest are fetched in
+    a single bulk yf.download() call. Bulk quotes carry no extended-hours
+    fields, so they are cached under quote:bulk:SYM and never replace the
+    full quote:SYM entry that get_quote() and the quote stream read.
+    """
+    quotes: dict[str, dict] = {}
+    missing = []
+    for symbol in dict.fromkeys(s.upper() for s in symbols):
+        cached = cache.get(f"quote:{symbol}", ttl=QUOTE_TTL) or cache.get(f"quote:bulk:{symbol}", ttl=QUOTE_TTL)
+        if cached:
+            quotes[symbol] = cached
+        else:
+            missing.append(symbol)
+
+    if missing:
+        for symbol, quote in _download_quotes(missing, timeout).items():
+            cache.set(f"quote:bulk:{symbol}", quote)
+            quotes[symbol] = quote
+    return quotes
+
+
+def _download_quotes(symbols: list[str], timeout: float) -> dict[str, dict]:
+    try:
+        data = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            threads=True,
+            progress=False,
+            timeout=timeout,
+        )
+    except Exception as e:
+        logger.warning(f"Bulk quote download failed for {len(symbols)} symbols: {e}")
+        return {}
+    if data is None or data.empty:
+        return {}
+
+    quotes = {}
+    for symbol in symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if symbol not in data.columns.get_level_values(0):
+                continue
+            frame = data[symbol]
+        else:
+            frame = data
+        frame = frame.dropna(subset=["Close"])
+        if frame.empty:
+            continue
+
+        last = frame.iloc[-1]
+        price = round(float(last["Close"]), 2)
+        prev_close = float(frame["Close"].iloc[-2]) if len(frame) > 1 else price
+        change = round(price - prev_close, 2)
+        change_pct = round((change / prev_close) * 100, 2) if prev_close else 0
+        quotes[symbol] = {
+            "symbol": symbol,
+            "price": price,
+            "change": change,
+            "changePercent": change_pct,
+            "high": round(float(last["High"]), 2),
+            "low": round(float(last["Low"]), 2),
+            "volume": int(last["Volume"]) if pd.notna(last["Volume"]) else 0,
+            "extPrice": None,
+            "extChange": None,
+            "extChangePercent": None,
+            "extLabel": None,
+        }
+    return quotes
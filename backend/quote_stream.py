@@ -0,0 +1,106 @@
+import asyncio
+import contextvars
+import logging
+import os
+
+import aio
+import market_data
+
+logger = logging.getLogger(__name__)
+
+# Seconds between upstream polls of each subscribed symbol.
+POLL_INTERVAL = float(os.environ.get("QUOTE_STREAM_INTERVAL", "15"))
+# Updates a slow client may fall behind by before pending ones are merged.
+# Must exceed the symbols one stream can subscribe to (MAX_BATCH_SYMBOLS).
+QUEUE_SIZE = 256
+
+
+class QuoteHub:
+    """Fans quote updates out to subscribers with one poller per symbol.
+
+    Upstream load scales with the number of distinct subscribed symbols, not
+    with the number of connected clients. Each update only carries the fields
+    that changed since the previous one; new subscribers first get the full
+    last known quote.
+    """
+
+    def __init__(self, interval: float = POLL_INTERVAL):
+        self.interval = interval
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._pollers: dict[str, asyncio.Task] = {}
+        self._last: dict[str, dict] = {}
+
+    def subscribe(self, symbols: list[str]) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        for symbol in symbols:
+            self._subscribers.setdefault(symbol, set()).add(queue)
+            if symbol in self._last:
+                self._offer(queue, self._last[symbol])
+            if symbol not in self._pollers:
+                # Pollers outlive the request that starts them, so they
+                # mustn't inherit its context (e.g. its cache.track()).
+                self._pollers[symbol] = asyncio.create_task(self._poll(symbol), context=contextvars.Context())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue, symbols: list[str]):
+        for symbol in symbols:
+            subscribers = self._subscribers.get(symbol)
+            if subscribers is None:
+                continue
+            subscribers.discard(queue)
+            if not subscribers:
+                # Nobody is watching any more: stop polling this symbol.
+                del self._subscribers[symbol]
+                self._last.pop(symbol, None)
+                poller = self._pollers.pop(symbol, None)
+                if poller is not None:
+                    poller.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "symbols": len(self._pollers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+        }
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: dict):
+        if not queue.full():
+            queue.put_nowait(message)
+            return
+        # Updates are deltas, so dropping one would leave the client with
+        # stale fields. Fold everything pending into one update per symbol.
+        pending: dict[str, dict] = {}
+        while not queue.empty():
+            update = queue.get_nowait()
+            pending.setdefault(update["symbol"], {}).update(update)
+        pending.setdefault(message["symbol"], {}).update(message)
+        for update in pending.values():
+            queue.put_nowait(update)
+
+    def _publish(self, symbol: str, quote: dict):
+        last = self._last.get(symbol)
+        if last is None:
+            delta = dict(quote)
+        else:
+            delta = {k: v for k, v in quote.items() if last.get(k) != v}
+            if not delta:
+                return
+            delta["symbol"] = symbol
+        self._last[symbol] = quote
+        for queue in self._subscribers.get(symbol, ()):
+            self._offer(queue, delta)
+
+    async def _poll(self, symbol: str):
+        while True:
+            try:
+                quote = await aio.run_blocking(market_data.get_quote, symbol)
+                if quote:
+                    self._publish(symbol, quote)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Quote stream poll failed for {symbol}: {e}")
+            await asyncio.sleep(self.interval)
+
+
+hub = QuoteHub()
@@ -0,0 +1,124 @@
+import datetime
+
+import numpy as np
+import orjson
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# orjson writes NumPy arrays and scalars straight from their buffers, so
+# routers can hand back float64/int64 arrays instead of converting every
+# element to a Python number first. NaN and infinities become null.
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        # String/object dtypes and non-contiguous views aren't native to orjson.
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime.date, datetime.time)):
+        # pandas Timestamp and other datetime subclasses
+        return obj.isoformat()
+    to_numpy = getattr(obj, "to_numpy", None)
+    if callable(to_numpy):
+        # pandas Series and Index
+        return to_numpy()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    FastAPI's default for the app. Returning an instance from a route also
+    skips jsonable_encoder, which walks every element of large payloads and
+    can't handle NumPy arrays; do that for the heavy endpoints.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# Chart series (/ohlc, /indicators) come in three layouts, picked with the
+# `format` query parameter or, failing that, the Accept header:
+#   rows      one JSON object per bar (default)
+#   columnar  JSON object of parallel arrays
+#   packed    PACKED_MEDIA_TYPE, raw little-endian column buffers that the
+#             browser wraps in typed arrays without parsing
+#
+# A packed body is a uint32 header length, that many bytes of UTF-8 JSON
+# header, zero padding to an 8-byte boundary, then the column buffers, each
+# starting on an 8-byte boundary. The header is
+#   {"meta": {...}, "tables": {name: {"length": n, "decimals": d,
+#     "columns": [{"name": ..., "type": "uint32"|"float32"|"float64", "offset": ...}]}}}
+# with offsets counted from the start of the first buffer. A float column is
+# only sent as float32 when rounding every float32 value to `decimals`
+# places gives the same number as rounding the original, so rounding on the
+# client gives back the exact JSON numbers; otherwise it stays float64.
+PACKED_MEDIA_TYPE = "application/vnd.stock-platform.packed"
+FORMATS = ("rows", "columnar", "packed")
+
+
+def negotiate(request: Request, format: str | None) -> str:
+    if format in FORMATS:
+        return format
+    if format is None and PACKED_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "packed"
+    return "rows"
+
+
+def format_response(content, format: str) -> Response:
+    # The same URL can answer in JSON or packed form.
+    headers = {"Vary": "Accept"}
+    if format == "packed":
+        return Response(content, media_type=PACKED_MEDIA_TYPE, headers=headers)
+    return ORJSONResponse(content, headers=headers)
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def _compact(values: np.ndarray, decimals: int) -> np.ndarray:
+    """values in the smallest of uint32/float32/float64 that keeps them exact."""
+    if values.dtype.kind in "iub":
+        if len(values) == 0 or (values.min() >= 0 and values.max() < 2**32):
+            return values.astype("<u4")
+        return values.astype("<f8")
+    f4 = values.astype("<f4")
+    # float32 only if rounding it gives back exactly what the JSON would say.
+    with np.errstate(invalid="ignore", over="ignore"):
+        if np.array_equal(np.round(f4.astype("f8"), decimals), np.round(values, decimals), equal_nan=True):
+            return f4
+    return values.astype("<f8")
+
+
+def pack(tables: dict[str, dict[str, np.ndarray]], meta: dict, decimals: dict[str, int]) -> bytes:
+    """Encode {table: {column: array}} in the packed layout described above."""
+    header_tables = {}
+    buffers = []
+    offset = 0
+    for name, columns in tables.items():
+        places = decimals.get(name, 2)
+        specs = []
+        length = 0
+        for column, values in columns.items():
+            data = _compact(np.asarray(values), places)
+            length = len(data)
+            specs.append({"name": column, "type": data.dtype.name, "offset": offset})
+            buffers.append((offset, data))
+            offset = _align(offset + data.nbytes)
+        header_tables[name] = {"length": length, "decimals": places, "columns": specs}
+
+    header = orjson.dumps({"meta": meta, "tables": header_tables})
+    start = _align(4 + len(header))
+    out = bytearray(start + offset)
+    out[:4] = len(header).to_bytes(4, "little")
+    out[4:4 + len(header)] = header
+    for position, data in buffers:
+        out[start + position:start + position + data.nbytes] = data.tobytes()
+    return bytes(out)
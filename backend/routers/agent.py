@@ -1,20 +1,39 @@
+import asyncio
+import json
 import os
 import uuid
 import time
 import logging
 
-import anthropic
-import numpy as np
 import yfinance as yf
 
+import aio
+import bar_store
+import cache
+import llm
+import market_data
+from routers import indicators
+
 logger = logging.getLogger(__name__)
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 router = APIRouter()
 
 ANTHROPIC_API_KEY = os.environ.get("ANTHROPIC_API_KEY")
 
+# Persona analyses run concurrently. Each call is bounded by its own timeout
+# once it has an LLM slot; waiting for the slot has a separate limit.
+PERSONA_CONCURRENCY = int(os.environ.get("AGENT_PERSONA_CONCURRENCY", "5"))
+PERSONA_TIMEOUT = float(os.environ.get("AGENT_PERSONA_TIMEOUT", "60"))
+PERSONA_QUEUE_TIMEOUT = float(os.environ.get("AGENT_PERSONA_QUEUE_TIMEOUT", "120"))
+
+# Prompt context caching. The chart block is keyed by bar version, so its
+# TTL only bounds memory; the live quote block expires quickly.
+CHART_CONTEXT_TTL = 600
+QUOTE_CONTEXT_TTL = 30
+
 
 class AskRequest(BaseModel):
     message: str
@@ -27,62 +46,50 @@ class AnalyzeRequest(BaseModel):
 
 
 def _fetch_chart_data(symbol: str) -> str:
-    """Fetch historical OHLC data and technical indicators for chart pattern analysis."""
+    """Fetch historical OHLC data and technical indicators for chart pattern analysis.
+
+    The text only changes when the bars do, so it is cached per bar version.
+    """
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period="1y", interval="1d")
+        hist = bar_store.get_history(symbol, "1y", "1d")
         if hist.empty:
             return ""
+        weekly = bar_store.get_history(symbol, "6mo", "1wk")
+        snapshot = indicators.technical_snapshot(symbol, hist)
+        cache_key = f"agent:chart:{symbol.upper()}:{bar_store.version(hist)}:{bar_store.version(weekly)}"
+        return cache.get_or_fetch(
+            cache_key, CHART_CONTEXT_TTL, lambda: _format_chart_data(hist, weekly, snapshot)
+        ) or ""
+    except Exception as e:
+        logger.error(f"Error fetching chart data for {symbol}: {e}")
+        return ""
 
-        close = hist["Close"].values
-        high = hist["High"].values
-        low = hist["Low"].values
-        volume = hist["Volume"].values
 
-        # --- Technical Indicators ---
+def _format_technicals(snapshot: dict) -> list[str]:
+    """Prompt lines for a technical snapshot, shared by the chat and Micha contexts."""
+    lines = []
+    for period, sma in snapshot["sma"].items():
+        lines.append(f"  SMA {period}: ${sma['value']:.2f} ({sma['position']} by {abs(sma['diffPercent']):.1f}%)")
+    if snapshot["rsi"] is not None:
+        lines.append(f"  RSI (14): {snapshot['rsi']:.1f}")
+    if snapshot["high52w"] is not None:
+        lines.append(f"  52W High: ${snapshot['high52w']:.2f}")
+        lines.append(f"  52W Low: ${snapshot['low52w']:.2f}")
+    lines.append(f"  20-Day High: ${snapshot['high20']:.2f}")
+    lines.append(f"  20-Day Low: ${snapshot['low20']:.2f}")
+    lines.append(f"  Avg Volume 20D: {snapshot['avgVolume20']:,}")
+    lines.append(f"  Avg Volume 50D: {snapshot['avgVolume50']:,}")
+    lines.append(f"  Volume Trend: {snapshot['volumeTrend']}")
+    return lines
+
+
+def _format_chart_data(hist, weekly, snapshot: dict) -> str | None:
+    try:
         lines = ["\nChart & Technical Analysis Data:"]
-
-        # SMAs
-        for period in [20, 50, 150]:
-            if len(close) >= period:
-                sma = float(np.nanmean(close[-period:]))
-                pos = "above" if close[-1] > sma else "below"
-                diff = ((close[-1] - sma) / sma) * 100
-                lines.append(f"  SMA {period}: ${sma:.2f} ({pos} by {abs(diff):.1f}%)")
-
-        # RSI (14-period)
-        if len(close) >= 15:
-            deltas = np.diff(close[-15:])
-            gains = np.where(deltas > 0, deltas, 0)
-            losses = np.where(deltas < 0, -deltas, 0)
-            avg_gain = np.mean(gains)
-            avg_loss = np.mean(losses)
-            if avg_loss > 0:
-                rs = avg_gain / avg_loss
-                rsi = 100 - (100 / (1 + rs))
-            else:
-                rsi = 100
-            lines.append(f"  RSI (14): {rsi:.1f}")
-
-        # 52-week and 20-day ranges
-        if len(close) >= 252:
-            lines.append(f"  52W High: ${float(np.max(high[-252:])):.2f}")
-            lines.append(f"  52W Low: ${float(np.min(low[-252:])):.2f}")
-        high_20 = float(np.max(high[-20:]))
-        low_20 = float(np.min(low[-20:]))
-        lines.append(f"  20-Day High: ${high_20:.2f}")
-        lines.append(f"  20-Day Low: ${low_20:.2f}")
-
-        # Volume trend
-        avg_vol_20 = float(np.nanmean(volume[-20:]))
-        avg_vol_50 = float(np.nanmean(volume[-50:])) if len(volume) >= 50 else avg_vol_20
-        vol_ratio = avg_vol_20 / avg_vol_50 if avg_vol_50 > 0 else 1
-        lines.append(f"  Avg Volume 20D: {int(avg_vol_20):,}")
-        lines.append(f"  Volume Trend: {'increasing' if vol_ratio > 1.1 else 'decreasing' if vol_ratio < 0.9 else 'stable'}")
+        lines.extend(_format_technicals(snapshot))
 
         # --- Weekly OHLC summary (last 6 months ~ 26 weeks) for pattern recognition ---
         lines.append("\nWeekly OHLC (last 6 months):")
-        weekly = ticker.history(period="6mo", interval="1wk")
         if not weekly.empty:
             for date, row in weekly.iterrows():
                 d = date.strftime("%Y-%m-%d")
@@ -103,13 +110,12 @@ def _fetch_chart_data(symbol: str) -> str:
 
         return "\n".join(lines)
     except Exception as e:
-        logger.error(f"Error fetching chart data for {symbol}: {e}")
-        return ""
+        logger.error(f"Error formatting chart data: {e}")
+        return None
 
 
 def _fetch_quote(symbol: str) -> dict:
-    ticker = yf.Ticker(symbol)
-    info = ticker.info
+    info = market_data.get_info(symbol)
 
     if not info or "regularMarketPrice" not in info:
         return {}
@@ -150,7 +156,7 @@ def _fetch_quote(symbol: str) -> dict:
     # Fallback: fetch extended hours data from intraday history if info didn't have it
     if "preMarketPrice" not in result or "postMarketPrice" not in result:
         try:
-            ext_hist = ticker.history(period="5d", interval="5m", prepost=True)
+            ext_hist = yf.Ticker(symbol).history(period="5d", interval="5m", prepost=True)
             if not ext_hist.empty:
                 # Convert to NY timezone, then strip tz for reliable filtering
                 if ext_hist.index.tz is not None:
@@ -196,6 +202,14 @@ def _fetch_quote(symbol: str) -> dict:
     return result
 
 
+def _quote_context(ticker: str) -> str:
+    """Formatted live quote, cached briefly so a chat burst shares one fetch."""
+    cache_key = f"agent:quote:{ticker.upper()}"
+    return cache.get_or_fetch(
+        cache_key, QUOTE_CONTEXT_TTL, lambda: _format_quote_context(_fetch_quote(ticker), ticker)
+    )
+
+
 def _format_quote_context(quote: dict, ticker_symbol: str) -> str:
     if not quote:
         return f"Could not fetch live data for {ticker_symbol.upper()}."
@@ -308,29 +322,29 @@ SYSTEM_PROMPT = (
 )
 
 
-@router.post("/agent/ask")
-def ask_agent(req: AskRequest):
-    if not ANTHROPIC_API_KEY:
-        raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
-
-    quote = _fetch_quote(req.ticker)
-    quote_context = _format_quote_context(quote, req.ticker)
-
-    chart_data = _fetch_chart_data(req.ticker)
+async def _ask_request(req: AskRequest) -> dict:
+    quote_context, chart_data = await asyncio.gather(
+        aio.run_blocking(_quote_context, req.ticker),
+        aio.run_blocking(_fetch_chart_data, req.ticker),
+    )
     logger.info(f"Chart data for {req.ticker}: {len(chart_data)} chars")
 
-    system = f"{SYSTEM_PROMPT}\n\nCurrent market data:\n{quote_context}{chart_data}"
+    # Stable blocks first, each ending in a cache breakpoint, so follow-up
+    # questions reuse the cached prefix and only the live quote is new input.
+    system = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+    if chart_data:
+        system.append({"type": "text", "text": chart_data.lstrip("\n"), "cache_control": {"type": "ephemeral"}})
+    system.append({"type": "text", "text": f"Current market data:\n{quote_context}"})
 
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-    response = client.messages.create(
-        model="claude-sonnet-4-5-20250929",
-        max_tokens=2048,
-        system=system,
-        messages=[{"role": "user", "content": req.message}],
-    )
+    return {
+        "model": "claude-sonnet-4-5-20250929",
+        "max_tokens": 2048,
+        "system": system,
+        "messages": [{"role": "user", "content": req.message}],
+    }
 
-    content = response.content[0].text
 
+def _agent_message(content: str) -> dict:
     return {
         "id": str(uuid.uuid4()),
         "role": "agent",
@@ -339,20 +353,63 @@ def ask_agent(req: AskRequest):
     }
 
 
-@router.post("/agent/analyze")
-def analyze_stock(req: AnalyzeRequest):
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/agent/ask")
+async def ask_agent(req: AskRequest):
     if not ANTHROPIC_API_KEY:
         raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
 
-    quote = _fetch_quote(req.ticker)
-    quote_context = _format_quote_context(quote, req.ticker)
+    request = await _ask_request(req)
+    response = await llm.create(**request)
+
+    return _agent_message(response.content[0].text)
+
+
+@router.post("/agent/ask/stream")
+async def ask_agent_stream(req: AskRequest):
+    """Server-Sent Events: `delta` events with text as it is generated, then
+    `done` with the same message object /agent/ask returns (or `error`)."""
+    if not ANTHROPIC_API_KEY:
+        raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
+
+    request = await _ask_request(req)
+
+    async def events():
+        parts = []
+        try:
+            async with llm.stream(**request) as stream:
+                async for text in stream.text_stream:
+                    parts.append(text)
+                    yield _sse("delta", {"text": text})
+        except Exception as e:
+            logger.warning(f"Streamed answer for {req.ticker} failed: {e}")
+            yield _sse("error", {"error": str(e) or type(e).__name__})
+            return
+        yield _sse("done", _agent_message("".join(parts)))
+
+    return _sse_response(events())
+
+
+def _analysis_context(ticker: str, with_technicals: bool) -> tuple[str, str]:
+    """Return (shared market data context, Micha's extra technical context)."""
+    quote_context = _quote_context(ticker)
 
     # Fetch overview info
     try:
-        ticker = yf.Ticker(req.ticker)
-        info = ticker.info
+        info = market_data.get_info(ticker)
         overview = (
-            f"Company: {info.get('shortName', req.ticker)}\n"
+            f"Company: {info.get('shortName', ticker)}\n"
             f"Sector: {info.get('sector', 'N/A')}\n"
             f"Market Cap: ${info.get('marketCap', 0):,}\n"
             f"P/E: {info.get('trailingPE', 'N/A')}\n"
@@ -367,50 +424,22 @@ def analyze_stock(req: AnalyzeRequest):
 
     # Fetch technical data for Micha
     technical_context = ""
-    if "micha" in req.analysts:
+    if with_technicals:
         try:
-            ticker_obj = yf.Ticker(req.ticker)
-            hist = ticker_obj.history(period="1y", interval="1d")
-            if not hist.empty:
-                close = hist["Close"].values
-                # SMA 150
-                sma_150 = float(np.nanmean(close[-150:])) if len(close) >= 150 else None
-                sma_50 = float(np.nanmean(close[-50:])) if len(close) >= 50 else None
-                sma_20 = float(np.nanmean(close[-20:])) if len(close) >= 20 else None
-                current = float(close[-1])
-
-                technical_context = "\nTechnical Data:\n"
-                technical_context += f"  Current Price: ${current:.2f}\n"
-                if sma_20:
-                    technical_context += f"  SMA 20: ${sma_20:.2f} ({'above' if current > sma_20 else 'below'})\n"
-                if sma_50:
-                    technical_context += f"  SMA 50: ${sma_50:.2f} ({'above' if current > sma_50 else 'below'})\n"
-                if sma_150:
-                    diff_pct = ((current - sma_150) / sma_150) * 100
-                    position = "above" if current > sma_150 else "below"
-                    technical_context += f"  SMA 150: ${sma_150:.2f} ({position} by {abs(diff_pct):.1f}%)\n"
-
-                # Recent price action (last 20 days)
-                recent = close[-20:]
-                high_20 = float(np.max(recent))
-                low_20 = float(np.min(recent))
-                technical_context += f"  20-Day High: ${high_20:.2f}\n"
-                technical_context += f"  20-Day Low: ${low_20:.2f}\n"
-
-                # Volume trend
-                vol = hist["Volume"].values
-                avg_vol_20 = float(np.nanmean(vol[-20:]))
-                avg_vol_50 = float(np.nanmean(vol[-50:])) if len(vol) >= 50 else avg_vol_20
-                technical_context += f"  Avg Volume 20D: {int(avg_vol_20):,}\n"
-                technical_context += f"  Avg Volume 50D: {int(avg_vol_50):,}\n"
-                vol_ratio = avg_vol_20 / avg_vol_50 if avg_vol_50 > 0 else 1
-                technical_context += f"  Volume Trend: {'increasing' if vol_ratio > 1.1 else 'decreasing' if vol_ratio < 0.9 else 'stable'}\n"
-        except Exception:
-            pass
-
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-    results = []
+            snapshot = indicators.technical_snapshot(ticker)
+            if snapshot is not None:
+                lines = ["", "Technical Data:", f"  Current Price: ${snapshot['price']:.2f}"]
+                lines.extend(_format_technicals(snapshot))
+                technical_context = "\n".join(lines) + "\n"
+        except Exception as e:
+            logger.warning(f"Technical snapshot failed for {ticker}: {e}")
+
+    return data_context, technical_context
+
 
+def _persona_requests(req: AnalyzeRequest, data_context: str, technical_context: str) -> list[tuple[dict, dict]]:
+    """(persona, messages.create kwargs) for each known analyst, in request order."""
+    requests = []
     for analyst_key in req.analysts:
         persona = ANALYST_PERSONAS.get(analyst_key)
         if not persona:
@@ -428,17 +457,118 @@ def analyze_stock(req: AnalyzeRequest):
 
         system = f"{persona['prompt']}\n\n{ctx}\n\nKeep your analysis concise ({word_limit}). Give a clear verdict: Buy, Hold, or Sell."
 
-        response = client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=max_tokens,
-            system=system,
-            messages=[{"role": "user", "content": f"Analyze {req.ticker.upper()} for me."}],
-        )
+        requests.append((persona, {
+            "model": "claude-sonnet-4-5-20250929",
+            "max_tokens": max_tokens,
+            "system": system,
+            "messages": [{"role": "user", "content": f"Analyze {req.ticker.upper()} for me."}],
+        }))
+    return requests
+
+
+@router.post("/agent/analyze")
+async def analyze_stock(req: AnalyzeRequest):
+    if not ANTHROPIC_API_KEY:
+        raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
+
+    data_context, technical_context = await aio.run_blocking(
+        _analysis_context, req.ticker, "micha" in req.analysts
+    )
+
+    semaphore = asyncio.Semaphore(PERSONA_CONCURRENCY)
+    calls = [
+        _run_persona(semaphore, persona, request)
+        for persona, request in _persona_requests(req, data_context, technical_context)
+    ]
+
+    # gather() keeps request order; each call reports its own failure.
+    return await asyncio.gather(*calls)
 
-        results.append({
-            "analyst": persona["name"],
-            "style": persona["style"],
-            "analysis": response.content[0].text,
-        })
 
-    return results
+@router.post("/agent/analyze/stream")
+async def analyze_stock_stream(req: AnalyzeRequest):
+    """Server-Sent Events with every persona streamed at once.
+
+    `start` lists the analysts in request order, then `delta` events carry
+    text tagged with the analyst name as it arrives from any persona. Each
+    persona ends with `done`, holding the same object /agent/analyze returns
+    for it, and `end` closes the stream.
+    """
+    if not ANTHROPIC_API_KEY:
+        raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
+
+    data_context, technical_context = await aio.run_blocking(
+        _analysis_context, req.ticker, "micha" in req.analysts
+    )
+    requests = _persona_requests(req, data_context, technical_context)
+
+    semaphore = asyncio.Semaphore(PERSONA_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def events():
+        yield _sse("start", {"analysts": [{"analyst": p["name"], "style": p["style"]} for p, _ in requests]})
+        tasks = [
+            asyncio.create_task(_stream_persona(semaphore, persona, request, queue))
+            for persona, request in requests
+        ]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                event, data = await queue.get()
+                if event == "done":
+                    remaining -= 1
+                yield _sse(event, data)
+            yield _sse("end", {})
+        finally:
+            # The client went away mid-stream: stop paying for the rest.
+            for task in tasks:
+                task.cancel()
+
+    return _sse_response(events())
+
+
+async def _run_persona(semaphore: asyncio.Semaphore, persona: dict, request: dict) -> dict:
+    result = {"analyst": persona["name"], "style": persona["style"], "analysis": ""}
+    async with semaphore:
+        try:
+            response = await llm.create(
+                call_timeout=PERSONA_TIMEOUT, queue_timeout=PERSONA_QUEUE_TIMEOUT, **request
+            )
+            result["analysis"] = response.content[0].text
+        except TimeoutError:
+            logger.warning(f"{persona['name']} analysis timed out after {PERSONA_TIMEOUT:g}s")
+            result["error"] = f"Timed out after {PERSONA_TIMEOUT:g}s"
+        except llm.QueueTimeout as e:
+            logger.warning(f"{persona['name']} analysis not started: {e}")
+            result["error"] = str(e)
+        except Exception as e:
+            logger.warning(f"{persona['name']} analysis failed: {e}")
+            result["error"] = str(e) or type(e).__name__
+    return result
+
+
+async def _stream_persona(semaphore: asyncio.Semaphore, persona: dict, request: dict, queue: asyncio.Queue):
+    """Streaming counterpart of _run_persona: puts ("delta"|"done", data) on queue."""
+    result = {"analyst": persona["name"], "style": persona["style"], "analysis": ""}
+    parts = []
+
+    async def consume():
+        async with llm.stream(call_timeout=PERSONA_TIMEOUT, queue_timeout=PERSONA_QUEUE_TIMEOUT, **request) as stream:
+            async for text in stream.text_stream:
+                parts.append(text)
+                queue.put_nowait(("delta", {"analyst": persona["name"], "text": text}))
+
+    async with semaphore:
+        try:
+            await consume()
+        except TimeoutError:
+            logger.warning(f"{persona['name']} analysis timed out after {PERSONA_TIMEOUT:g}s")
+            result["error"] = f"Timed out after {PERSONA_TIMEOUT:g}s"
+        except llm.QueueTimeout as e:
+            logger.warning(f"{persona['name']} analysis not started: {e}")
+            result["error"] = str(e)
+        except Exception as e:
+            logger.warning(f"{persona['name']} analysis failed: {e}")
+            result["error"] = str(e) or type(e).__name__
+    result["analysis"] = "".join(parts)
+    queue.put_nowait(("done", result))
@@ -1,25 +1,24 @@
+from datetime import date
+
+import numpy as np
 from fastapi import APIRouter, HTTPException, Query
 import yfinance as yf
-import cache
+import aio
 import edgar
+import market_data
+from responses import ORJSONResponse
 
 router = APIRouter()
 
 
 @router.get("/fundamentals/{symbol}/overview")
-def get_overview(symbol: str):
-    cache_key = f"overview:{symbol.upper()}"
-    cached = cache.get(cache_key, ttl=300)
-    if cached:
-        return cached
-
-    ticker = yf.Ticker(symbol)
-    info = ticker.info
+async def get_overview(symbol: str, refresh: bool = Query(False)):
+    info = await aio.run_blocking(market_data.get_info, symbol, refresh=refresh)
 
     if not info or "regularMarketPrice" not in info:
         raise HTTPException(status_code=404, detail=f"No data for {symbol}")
 
-    result = {
+    return {
         "symbol": symbol.upper(),
         "name": info.get("shortName", ""),
         "sector": info.get("sector", "N/A"),
@@ -36,16 +35,18 @@ def get_overview(symbol: str):
         "avgVolume": info.get("averageVolume", 0),
         "price": info.get("regularMarketPrice", 0),
     }
-    cache.set(cache_key, result)
-    return result
 
 
 @router.get("/fundamentals/{symbol}/financials")
-def get_financials(
+async def get_financials(
     symbol: str,
     statement: str = Query("income"),
     period: str = Query("annual"),
 ):
+    return ORJSONResponse(await aio.run_blocking(_financials, symbol, statement, period))
+
+
+def _financials(symbol: str, statement: str, period: str) -> dict:
     ticker = yf.Ticker(symbol)
 
     try:
@@ -62,16 +63,11 @@ def get_financials(
             return {"columns": [], "rows": []}
 
         columns = [col.strftime("%Y-%m-%d") if hasattr(col, "strftime") else str(col) for col in df.columns]
-        rows = []
-        for idx, row in df.iterrows():
-            label = str(idx)
-            values = {}
-            for col_name, val in zip(columns, row):
-                if val is not None and str(val) != "nan":
-                    values[col_name] = float(val)
-                else:
-                    values[col_name] = None
-            rows.append({"label": label, "values": values})
+        # Missing values stay NaN here; ORJSONResponse writes them as null.
+        rows = [
+            {"label": str(label), "values": dict(zip(columns, values))}
+            for label, values in zip(df.index, df.to_numpy(dtype="f8", na_value=np.nan).tolist())
+        ]
 
         return {"columns": columns, "rows": rows}
     except Exception as e:
@@ -79,7 +75,11 @@ def get_financials(
 
 
 @router.get("/fundamentals/{symbol}/earnings")
-def get_earnings(symbol: str):
+async def get_earnings(symbol: str):
+    return await aio.run_blocking(_earnings, symbol)
+
+
+def _earnings(symbol: str) -> list:
     ticker = yf.Ticker(symbol)
 
     try:
@@ -100,68 +100,72 @@ def get_earnings(symbol: str):
         return []
 
 
+SEC_FILING_FORMS = {"10-K", "10-Q", "8-K", "10-K/A", "10-Q/A"}
+
+
 @router.get("/fundamentals/{symbol}/sec-filings")
-def get_sec_filings(symbol: str):
-    cik = edgar.resolve_cik(symbol)
+async def get_sec_filings(
+    symbol: str,
+    form: str | None = Query(None, description="Comma-separated form types, or 'all' (default: 10-K, 10-Q, 8-K and amendments)"),
+    after: date | None = Query(None, description="Filed on or after (YYYY-MM-DD)"),
+    before: date | None = Query(None, description="Filed on or before (YYYY-MM-DD)"),
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    empty = {"filings": [], "total": 0, "offset": offset, "limit": limit}
+    cik = await edgar.resolve_cik(symbol)
     if not cik:
-        return {"filings": []}
+        return empty
 
     try:
-        subs = edgar.get_submissions(cik)
+        index = await edgar.get_filings_index(cik)
     except Exception:
-        return {"filings": []}
-
-    if not subs:
-        return {"filings": []}
-
-    recent = subs.get("filings", {}).get("recent", {})
-    if not recent:
-        return {"filings": []}
-
-    forms = recent.get("form", [])
-    dates = recent.get("filingDate", [])
-    descriptions = recent.get("primaryDocDescription", [])
-    accessions = recent.get("accessionNumber", [])
-    primary_docs = recent.get("primaryDocument", [])
-
-    filings = []
-    target_forms = {"10-K", "10-Q", "8-K", "10-K/A", "10-Q/A"}
-    for i in range(min(len(forms), 100)):
-        if forms[i] not in target_forms:
-            continue
-        acc_raw = accessions[i].replace("-", "")
-        url = f"https://www.sec.gov/Archives/edgar/data/{cik}/{acc_raw}/{primary_docs[i]}"
-        filings.append({
-            "form": forms[i],
-            "date": dates[i],
-            "description": descriptions[i] if i < len(descriptions) else "",
-            "url": url,
-        })
-        if len(filings) >= 20:
-            break
-
-    return {"filings": filings}
+        return empty
+
+    if not index:
+        return empty
+
+    if form is None:
+        forms = SEC_FILING_FORMS
+    elif form.strip().lower() == "all":
+        forms = None
+    else:
+        forms = {f.strip().upper() for f in form.split(",") if f.strip()}
+
+    return edgar.query_filings(
+        index,
+        cik,
+        forms=forms,
+        after=after.isoformat() if after else None,
+        before=before.isoformat() if before else None,
+        limit=limit,
+        offset=offset,
+    )
 
 
 @router.get("/fundamentals/{symbol}/sec-financials")
-def get_sec_financials(symbol: str, period: str = Query("annual")):
-    cik = edgar.resolve_cik(symbol)
+async def get_sec_financials(symbol: str, period: str = Query("annual")):
+    cik = await edgar.resolve_cik(symbol)
     if not cik:
         return {"columns": [], "rows": []}
 
     try:
-        facts = edgar.get_company_facts(cik)
+        facts = await edgar.get_company_facts(cik)
     except Exception:
         return {"columns": [], "rows": []}
 
     if not facts:
         return {"columns": [], "rows": []}
 
-    return edgar.extract_financials(facts, period)
+    return ORJSONResponse(edgar.extract_financials(facts, period))
 
 
 @router.get("/fundamentals/{symbol}/recommendations")
-def get_recommendations(symbol: str):
+async def get_recommendations(symbol: str):
+    return await aio.run_blocking(_recommendations, symbol)
+
+
+def _recommendations(symbol: str) -> dict:
     ticker = yf.Ticker(symbol)
 
     try:
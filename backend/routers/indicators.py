@@ -1,25 +1,34 @@
 import numpy as np
-from fastapi import APIRouter, HTTPException, Query
-import yfinance as yf
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query, Request
+import aio
+import bar_store
+import cache
+import indicator_engine
+import responses
+from routers.market import RANGE_MAP
 
 router = APIRouter()
 
-RANGE_MAP = {
-    "1D": ("1d", "5m"),
-    "1W": ("5d", "15m"),
-    "1M": ("1mo", "1d"),
-    "3M": ("3mo", "1d"),
-    "6M": ("6mo", "1d"),
-    "1Y": ("1y", "1d"),
-    "5Y": ("5y", "1wk"),
-    "MAX": ("max", "1mo"),
-}
+INDICATOR_TTL = 600
+DECIMALS = {"macd": 4}
 
 
-def _time_str(date, is_intraday):
-    if is_intraday:
-        return int(date.timestamp())
-    return date.strftime("%Y-%m-%d")
+def _serialize(times: np.ndarray, series: dict, decimals: int, columnar: bool):
+    """Drop bars where any series is NaN and round everything in one pass.
+
+    Returns {"time": array, name: array} when columnar (encoded as-is by
+    responses.ORJSONResponse or packed), else one dict per bar.
+    """
+    arrays = {name: np.asarray(values, dtype="f8") for name, values in series.items()}
+    mask = ~np.isnan(np.column_stack(list(arrays.values()))).any(axis=1)
+    columns = {"time": times[mask]}
+    for name, values in arrays.items():
+        columns[name] = np.round(values[mask], decimals)
+    if columnar:
+        return columns
+    names = tuple(columns)
+    return [dict(zip(names, row)) for row in zip(*(values.tolist() for values in columns.values()))]
 
 
 def _sma(close, period):
@@ -72,90 +81,150 @@ def _stochastic(high, low, close, k_period=14, d_period=3):
     return k, d
 
 
+def _compute(ind: str, hist) -> dict | None:
+    """Return {series name: values} for one indicator, or None if unknown."""
+    close = hist["Close"]
+    if ind.startswith("sma_"):
+        return {"value": _sma(close, int(ind.split("_")[1]))}
+    if ind.startswith("ema_"):
+        return {"value": _ema(close, int(ind.split("_")[1]))}
+    if ind == "rsi":
+        return {"value": _rsi(close)}
+    if ind == "macd":
+        macd_line, signal_line, histogram = _macd(close)
+        return {"macd": macd_line, "signal": signal_line, "histogram": histogram}
+    if ind == "bbands":
+        upper, middle, lower = _bbands(close)
+        return {"upper": upper, "middle": middle, "lower": lower}
+    if ind == "vwap":
+        return {"value": _vwap(hist["High"], hist["Low"], close, hist["Volume"])}
+    if ind == "stoch":
+        k, d_line = _stochastic(hist["High"], hist["Low"], close)
+        return {"k": k, "d": d_line}
+    return None
+
+
+def _last(series) -> float | None:
+    value = float(series.iloc[-1]) if len(series) else float("nan")
+    return None if np.isnan(value) else value
+
+
+def _snapshot(hist) -> dict:
+    close = hist["Close"]
+    volume = hist["Volume"]
+    price = float(close.iloc[-1])
+
+    smas = {}
+    for period in (20, 50, 150):
+        value = _last(_sma(close, period))
+        if value is None:
+            continue
+        smas[str(period)] = {
+            "value": round(value, 2),
+            "position": "above" if price > value else "below",
+            "diffPercent": round((price - value) / value * 100, 2),
+        }
+
+    avg_volume_20 = float(volume.tail(20).mean())
+    avg_volume_50 = float(volume.tail(50).mean()) if len(volume) >= 50 else avg_volume_20
+    volume_ratio = avg_volume_20 / avg_volume_50 if avg_volume_50 > 0 else 1
+    rsi = _last(_rsi(close))
+    year = hist.tail(252) if len(hist) >= 252 else None
+
+    return {
+        "asOf": hist.index[-1].strftime("%Y-%m-%d"),
+        "price": round(price, 2),
+        "sma": smas,
+        "rsi": round(rsi, 1) if rsi is not None else None,
+        "high20": round(float(hist["High"].tail(20).max()), 2),
+        "low20": round(float(hist["Low"].tail(20).min()), 2),
+        "high52w": round(float(year["High"].max()), 2) if year is not None else None,
+        "low52w": round(float(year["Low"].min()), 2) if year is not None else None,
+        "avgVolume20": int(avg_volume_20),
+        "avgVolume50": int(avg_volume_50),
+        "volumeTrend": "increasing" if volume_ratio > 1.1 else "decreasing" if volume_ratio < 0.9 else "stable",
+    }
+
+
+def technical_snapshot(symbol: str, hist=None) -> dict | None:
+    """Daily technical summary (SMAs, RSI, ranges, volume trend) for the last year of bars.
+
+    Shared by the agent prompts and /api/technicals, cached per bar version.
+    Pass hist to reuse 1y daily bars the caller already has.
+    """
+    if hist is None:
+        hist = bar_store.get_history(symbol, "1y", "1d")
+    if hist.empty:
+        return None
+    cache_key = f"ind:{symbol.upper()}:snapshot:{bar_store.version(hist)}"
+    return cache.get_or_fetch(cache_key, INDICATOR_TTL, lambda: _snapshot(hist))
+
+
+@router.get("/technicals/{symbol}")
+async def get_technicals(symbol: str):
+    snapshot = await aio.run_blocking(technical_snapshot, symbol)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No data for {symbol}")
+    return snapshot
+
+
 @router.get("/indicators/{symbol}")
-def get_indicators(
+async def get_indicators(
+    request: Request,
     symbol: str,
     range: str = Query("1M"),
     indicators: str = Query("sma_20,rsi,macd"),
+    format: str | None = Query(None, description="'rows', 'columnar' or 'packed' (default: from Accept, else rows)"),
 ):
+    format = responses.negotiate(request, format)
+    content = await aio.run_blocking(_indicators, symbol, range, indicators, format)
+    return responses.format_response(content, format)
+
+
+def _indicators(symbol: str, range: str, indicators: str, format: str) -> dict | bytes:
     period, interval = RANGE_MAP.get(range, ("1mo", "1d"))
-    ticker = yf.Ticker(symbol)
-    hist = ticker.history(period=period, interval=interval)
+    hist = bar_store.get_history(symbol, period, interval)
 
     if hist.empty:
         raise HTTPException(status_code=404, detail=f"No data for {symbol}")
 
-    is_intraday = interval in ("5m", "15m", "30m", "1h")
-    close = hist["Close"]
-    high = hist["High"]
-    low = hist["Low"]
-    volume = hist["Volume"]
-    dates = hist.index
+    is_intraday = interval in bar_store.INTRADAY_INTERVALS
+    packed = format == "packed"
+    # Series are memoized per indicator against this exact set of bars, so
+    # toggling one indicator on a chart only computes that one.
+    version = bar_store.version(hist)
+    requested = list(dict.fromkeys(i.strip() for i in indicators.split(",")))
+    times = None
+    synced = None
+
+    def build(ind: str):
+        nonlocal times, synced
+        if is_intraday:
+            # Live intraday charts only change at the last bar, so advance the
+            # incremental engine rather than recomputing the whole range.
+            if synced is None:
+                engine_times, synced = indicator_engine.sync(symbol, interval, hist, requested)
+                # Label the outputs with the engine's own bars, which the copy
+                # was taken with.
+                times = bar_store.chart_times(pd.to_datetime(engine_times, utc=True), interval, epoch=packed)
+            series = synced.get(ind)
+        else:
+            series = _compute(ind, hist)
+        if series is None:
+            return None
+        if times is None:
+            times = bar_store.chart_times(hist.index, interval, epoch=packed)
+        return _serialize(times, series, DECIMALS.get(ind, 2), format != "rows")
 
-    requested = [i.strip() for i in indicators.split(",")]
     result = {}
-
     for ind in requested:
-        if ind.startswith("sma_"):
-            p = int(ind.split("_")[1])
-            vals = _sma(close, p)
-            result[ind] = [
-                {"time": _time_str(d, is_intraday), "value": round(v, 2)}
-                for d, v in zip(dates, vals) if not np.isnan(v)
-            ]
-        elif ind.startswith("ema_"):
-            p = int(ind.split("_")[1])
-            vals = _ema(close, p)
-            result[ind] = [
-                {"time": _time_str(d, is_intraday), "value": round(v, 2)}
-                for d, v in zip(dates, vals) if not np.isnan(v)
-            ]
-        elif ind == "rsi":
-            vals = _rsi(close)
-            result["rsi"] = [
-                {"time": _time_str(d, is_intraday), "value": round(v, 2)}
-                for d, v in zip(dates, vals) if not np.isnan(v)
-            ]
-        elif ind == "macd":
-            macd_line, signal_line, histogram = _macd(close)
-            result["macd"] = [
-                {
-                    "time": _time_str(d, is_intraday),
-                    "macd": round(m, 4),
-                    "signal": round(s, 4),
-                    "histogram": round(h, 4),
-                }
-                for d, m, s, h in zip(dates, macd_line, signal_line, histogram)
-                if not (np.isnan(m) or np.isnan(s) or np.isnan(h))
-            ]
-        elif ind == "bbands":
-            upper, middle, lower = _bbands(close)
-            result["bbands"] = [
-                {
-                    "time": _time_str(d, is_intraday),
-                    "upper": round(u, 2),
-                    "middle": round(mi, 2),
-                    "lower": round(lo, 2),
-                }
-                for d, u, mi, lo in zip(dates, upper, middle, lower)
-                if not (np.isnan(u) or np.isnan(mi) or np.isnan(lo))
-            ]
-        elif ind == "vwap":
-            vals = _vwap(high, low, close, volume)
-            result["vwap"] = [
-                {"time": _time_str(d, is_intraday), "value": round(v, 2)}
-                for d, v in zip(dates, vals) if not np.isnan(v)
-            ]
-        elif ind == "stoch":
-            k, d_line = _stochastic(high, low, close)
-            result["stoch"] = [
-                {
-                    "time": _time_str(dt, is_intraday),
-                    "k": round(kv, 2),
-                    "d": round(dv, 2),
-                }
-                for dt, kv, dv in zip(dates, k, d_line)
-                if not (np.isnan(kv) or np.isnan(dv))
-            ]
-
+        # Packed responses are built from the columnar arrays with epoch times.
+        cache_key = f"ind:{symbol.upper()}:{range}:{ind}:{format}:{version}"
+        series = cache.get_or_fetch(cache_key, INDICATOR_TTL, lambda: build(ind))
+        if series is not None:
+            result[ind] = series
+
+    if packed:
+        time_format = "epoch" if is_intraday else "date"
+        return responses.pack(result, {"timeFormat": time_format}, {ind: DECIMALS.get(ind, 2) for ind in result})
     return result
@@ -1,6 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
-import yfinance as yf
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+import aio
+import bar_store
 import cache
+import edgar
+import market_data
+import quote_stream
+import responses
 
 router = APIRouter()
 
@@ -16,20 +25,38 @@ RANGE_MAP = {
 }
 
 
-@router.get("/search/{query}")
-def search_ticker(query: str):
-    cache_key = f"search:{query.strip().upper()}"
-    cached = cache.get(cache_key, ttl=300)
-    if cached:
-        return cached
+SEARCH_LIMIT = 8
 
-    import requests
 
+@router.get("/search/{query}")
+async def search_ticker(query: str):
+    # The local SEC list only knows US filers, so Yahoo is still asked for
+    # crypto, indices and foreign listings. An exact local ticker stays on
+    # top; Yahoo's entry for a symbol wins, as it carries the security type.
+    local = edgar.search_tickers(query, limit=SEARCH_LIMIT)
+    cache_key = f"search:{query.strip().upper()}"
+    try:
+        remote = await cache.aget_or_fetch(cache_key, 300, lambda: _search(query), stale_ttl=3600)
+    except HTTPException:
+        if not local:
+            raise
+        remote = []
+
+    key = query.strip().upper()
+    exact = [r for r in local if r["symbol"] == key]
+    by_symbol = {r["symbol"]: r for r in remote}
+    results = {}
+    for r in [*exact, *remote, *local]:
+        results.setdefault(r["symbol"], by_symbol.get(r["symbol"], r))
+    return list(results.values())[:SEARCH_LIMIT]
+
+
+async def _search(query: str) -> list:
     # Use Yahoo Finance search API for fuzzy name/ticker matching
     url = "https://query2.finance.yahoo.com/v1/finance/search"
     params = {
         "q": query.strip(),
-        "quotesCount": 8,
+        "quotesCount": SEARCH_LIMIT,
         "newsCount": 0,
         "listsCount": 0,
         "enableFuzzyQuery": True,
@@ -38,7 +65,7 @@ def search_ticker(query: str):
     headers = {"User-Agent": "Mozilla/5.0"}
 
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=5)
+        resp = await aio.http().get(url, params=params, headers=headers, timeout=5)
         resp.raise_for_status()
         data = resp.json()
     except Exception:
@@ -64,93 +91,110 @@ def search_ticker(query: str):
     if not results:
         raise HTTPException(status_code=404, detail=f"No results for '{query}'")
 
-    cache.set(cache_key, results)
     return results
 
 
 @router.get("/quote/{symbol}")
-def get_quote(symbol: str):
-    cache_key = f"quote:{symbol.upper()}"
-    cached = cache.get(cache_key, ttl=60)
-    if cached:
-        return cached
-
-    ticker = yf.Ticker(symbol)
-    info = ticker.info
-
-    if not info or "regularMarketPrice" not in info:
+async def get_quote(symbol: str, refresh: bool = Query(False)):
+    quote = await aio.run_blocking(market_data.get_quote, symbol, refresh=refresh)
+    if not quote:
         raise HTTPException(status_code=404, detail=f"No data found for {symbol}")
-
-    price = info.get("regularMarketPrice", 0)
-    prev_close = info.get("regularMarketPreviousClose", price)
-    change = round(price - prev_close, 2)
-    change_pct = round((change / prev_close) * 100, 2) if prev_close else 0
-
-    # Extended hours data
-    market_state = info.get("marketState", "")
-    ext_price = None
-    ext_change = None
-    ext_change_pct = None
-    ext_label = None
-
-    if market_state in ("PRE", "PREPRE") and info.get("preMarketPrice") is not None:
-        ext_price = round(info["preMarketPrice"], 2)
-        ext_change = round(info.get("preMarketChange", 0), 2)
-        ext_change_pct = round(info.get("preMarketChangePercent", 0), 2)
-        ext_label = "Pre-Market"
-    elif market_state in ("POST", "POSTPOST", "CLOSED") and info.get("postMarketPrice") is not None:
-        ext_price = round(info["postMarketPrice"], 2)
-        ext_change = round(info.get("postMarketChange", 0), 2)
-        ext_change_pct = round(info.get("postMarketChangePercent", 0), 2)
-        ext_label = "After Hours" if market_state == "POST" else "Post-Market"
-
-    result = {
-        "symbol": symbol.upper(),
-        "price": price,
-        "change": change,
-        "changePercent": change_pct,
-        "high": info.get("regularMarketDayHigh", 0),
-        "low": info.get("regularMarketDayLow", 0),
-        "volume": info.get("regularMarketVolume", 0),
-        "extPrice": ext_price,
-        "extChange": ext_change,
-        "extChangePercent": ext_change_pct,
-        "extLabel": ext_label,
-    }
-    cache.set(cache_key, result)
+    return quote
+
+
+@router.get("/quotes")
+async def get_quotes(symbols: str = Query(..., description="Comma-separated ticker symbols")):
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(requested) > market_data.MAX_BATCH_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {market_data.MAX_BATCH_SYMBOLS} symbols per request",
+        )
+
+    quotes = await aio.run_blocking(market_data.get_quotes, requested)
+    found = [sym for sym in requested if sym in quotes]
+
+    # Columnar layout: one array per field, aligned with "symbol".
+    result = {"symbol": found}
+    for field in market_data.QUOTE_FIELDS[1:]:
+        result[field] = [quotes[sym][field] for sym in found]
+    result["missing"] = [sym for sym in requested if sym not in quotes]
     return result
 
 
-@router.get("/ohlc/{symbol}")
-def get_ohlc(symbol: str, range: str = Query("1M")):
-    cache_key = f"ohlc:{symbol.upper()}:{range}"
-    cached = cache.get(cache_key, ttl=120)
-    if cached:
-        return cached
+@router.get("/stream/quotes")
+async def stream_quotes(request: Request, symbols: str = Query(..., description="Comma-separated ticker symbols")):
+    """Server-Sent Events: a full quote per symbol first, then only changed fields."""
+    requested = list(dict.fromkeys(s.strip().upper() for s in symbols.split(",") if s.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    if len(requested) > market_data.MAX_BATCH_SYMBOLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {market_data.MAX_BATCH_SYMBOLS} symbols per stream",
+        )
+
+    async def events():
+        queue = quote_stream.hub.subscribe(requested)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    update = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle stream.
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: quote\ndata: {json.dumps(update)}\n\n"
+        finally:
+            quote_stream.hub.unsubscribe(queue, requested)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.get("/ohlc/{symbol}")
+async def get_ohlc(
+    request: Request,
+    symbol: str,
+    range: str = Query("1M"),
+    format: str | None = Query(None, description="'rows', 'columnar' or 'packed' (default: from Accept, else rows)"),
+):
+    format = responses.negotiate(request, format)
+    cache_key = f"ohlc:{symbol.upper()}:{range}:{format}"
+    content = await aio.run_blocking(
+        cache.get_or_fetch, cache_key, 120, lambda: _fetch_ohlc(symbol, range, format), stale_ttl=600
+    )
+    return responses.format_response(content, format)
+
+
+def _fetch_ohlc(symbol: str, range: str, format: str = "rows") -> dict | bytes:
     period, interval = RANGE_MAP.get(range, ("1mo", "1d"))
-    ticker = yf.Ticker(symbol)
-    hist = ticker.history(period=period, interval=interval)
+    hist = bar_store.get_history(symbol, period, interval)
 
     if hist.empty:
         raise HTTPException(status_code=404, detail=f"No OHLC data for {symbol}")
 
-    bars = []
-    is_intraday = interval in ("5m", "15m", "30m", "1h")
-    for date, row in hist.iterrows():
-        if is_intraday:
-            time_str = int(date.timestamp())
+    # Round and convert whole columns at once rather than per bar.
+    columns = {"time": bar_store.chart_times(hist.index, interval, epoch=format == "packed")}
+    for name, column in bar_store.COLUMNS.items():
+        if name == "volume":
+            columns[name] = hist[column].fillna(0).to_numpy(dtype="i8")
         else:
-            time_str = date.strftime("%Y-%m-%d")
-        bars.append({
-            "time": time_str,
-            "open": round(row["Open"], 2),
-            "high": round(row["High"], 2),
-            "low": round(row["Low"], 2),
-            "close": round(row["Close"], 2),
-            "volume": int(row["Volume"]),
-        })
+            columns[name] = hist[column].to_numpy(dtype="f8").round(2)
+
+    if format == "packed":
+        time_format = "epoch" if interval in bar_store.INTRADAY_INTERVALS else "date"
+        return responses.pack({"bars": columns}, {"interval": interval, "timeFormat": time_format}, {"bars": 2})
+    if format == "columnar":
+        return {"bars": columns, "interval": interval}
+
+    names = tuple(columns)
+    bars = [dict(zip(names, row)) for row in zip(*(values.tolist() for values in columns.values()))]
 
     result = {"bars": bars, "interval": interval}
-    cache.set(cache_key, result)
     return result
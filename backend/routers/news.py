@@ -1,6 +1,7 @@
 import logging
 from fastapi import APIRouter
 import yfinance as yf
+import aio
 import cache
 
 logger = logging.getLogger(__name__)
@@ -9,7 +10,11 @@ router = APIRouter()
 
 
 @router.get("/news/{symbol}")
-def get_news(symbol: str):
+async def get_news(symbol: str):
+    return await aio.run_blocking(_news, symbol)
+
+
+def _news(symbol: str) -> list:
     cache_key = f"news:{symbol.upper()}"
     cached = cache.get(cache_key, ttl=1800)
     if cached is not None:
@@ -1,18 +1,35 @@
 import json
 import os
 import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from pathlib import Path
 
-import yfinance as yf
-from fastapi import APIRouter, HTTPException
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+import aio
+import cache
+import market_data
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
 
 router = APIRouter()
 
 DATA_DIR = Path(__file__).parent.parent / "data"
 PORTFOLIO_FILE = DATA_DIR / "portfolio.json"
+LOCK_FILE = DATA_DIR / "portfolio.json.lock"
 _lock = threading.Lock()
 
+# Holdings the bulk quote download couldn't price are retried one by one on
+# this pool; each gets PRICE_DEADLINE seconds before it is reported as failed.
+PRICE_WORKERS = int(os.environ.get("PORTFOLIO_PRICE_WORKERS", "16"))
+PRICE_DEADLINE = float(os.environ.get("PORTFOLIO_PRICE_DEADLINE", "8"))
+VALUATION_TTL = market_data.QUOTE_TTL
+_price_pool = ThreadPoolExecutor(max_workers=PRICE_WORKERS, thread_name_prefix="portfolio-price")
+
 
 class HoldingRequest(BaseModel):
     ticker: str
@@ -30,27 +47,89 @@ def _read_portfolio() -> dict:
 
 def _write_portfolio(data: dict):
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    with open(PORTFOLIO_FILE, "w") as f:
+    # Replace atomically so readers in other workers never see a partial file.
+    tmp = PORTFOLIO_FILE.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp, PORTFOLIO_FILE)
+
+
+@contextmanager
+def _portfolio_lock():
+    """Serialize read-modify-write of the portfolio across threads and worker processes."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        with open(LOCK_FILE, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _price_symbols(symbols: list[str]) -> dict[str, tuple[dict | None, bool, str | None]]:
+    """Price symbols concurrently. Returns {symbol: (quote, stale, error)}."""
+    priced: dict[str, tuple[dict | None, bool, str | None]] = {}
+    quotes = market_data.get_quotes(symbols, timeout=PRICE_DEADLINE)
+    for symbol in symbols:
+        if symbol in quotes:
+            priced[symbol] = (quotes[symbol], False, None)
+
+    remaining = [s for s in symbols if s not in priced]
+    futures = {_price_pool.submit(market_data.get_quote, s): s for s in remaining}
+    done, not_done = wait(futures, timeout=PRICE_DEADLINE)
+    errors: dict[str, str] = {}
+    for future in done:
+        symbol = futures[future]
+        try:
+            quote = future.result()
+        except Exception as e:
+            errors[symbol] = str(e) or type(e).__name__
+            continue
+        if quote:
+            priced[symbol] = (quote, False, None)
+        else:
+            errors[symbol] = "No price data"
+    for future in not_done:
+        errors[futures[future]] = f"Timed out after {PRICE_DEADLINE:g}s"
+
+    # Fall back to the last known quote, flagged as stale, before giving up.
+    for symbol, error in errors.items():
+        quote, _ = cache.lookup(f"quote:{symbol}", market_data.QUOTE_TTL, market_data.QUOTE_STALE_TTL)
+        if not quote:
+            quote, _ = cache.lookup(f"quote:bulk:{symbol}", market_data.QUOTE_TTL, market_data.QUOTE_STALE_TTL)
+        priced[symbol] = (quote, True, error) if quote else (None, False, error)
+    return priced
 
 
 def _enrich_with_prices(holdings: list) -> list:
+    priced = _price_symbols(list(dict.fromkeys(h["ticker"].upper() for h in holdings)))
     enriched = []
     for h in holdings:
-        try:
-            ticker = yf.Ticker(h["ticker"])
-            info = ticker.info
-            current_price = info.get("regularMarketPrice", 0)
-            prev_close = info.get("regularMarketPreviousClose", current_price)
-            daily_change = round(current_price - prev_close, 2) if prev_close else 0
-            daily_change_pct = round((daily_change / prev_close) * 100, 2) if prev_close else 0
-        except Exception:
-            current_price = 0
-            daily_change = 0
-            daily_change_pct = 0
+        quote, stale, error = priced.get(h["ticker"].upper(), (None, False, "No price data"))
+        cost = round(h["shares"] * h["buyPrice"], 2)
 
+        if quote is None:
+            # Unpriced holdings are flagged rather than valued at zero.
+            enriched.append({
+                **h,
+                "currentPrice": None,
+                "value": None,
+                "cost": cost,
+                "gain": None,
+                "gainPercent": None,
+                "dailyChange": None,
+                "dailyChangePercent": None,
+                "stale": False,
+                "priceError": error,
+            })
+            continue
+
+        current_price = quote["price"]
         value = round(h["shares"] * current_price, 2)
-        cost = round(h["shares"] * h["buyPrice"], 2)
         gain = round(value - cost, 2)
         gain_pct = round((gain / cost) * 100, 2) if cost else 0
 
@@ -61,32 +140,56 @@ def _enrich_with_prices(holdings: list) -> list:
             "cost": cost,
             "gain": gain,
             "gainPercent": gain_pct,
-            "dailyChange": daily_change,
-            "dailyChangePercent": daily_change_pct,
+            "dailyChange": quote["change"],
+            "dailyChangePercent": quote["changePercent"],
+            "stale": stale,
+            "priceError": error,
         })
     return enriched
 
 
+def _portfolio_version() -> int:
+    try:
+        return PORTFOLIO_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _valuation() -> list:
+    """Priced holdings, shared by the holdings and summary endpoints."""
+    cache_key = f"portfolio:valuation:{_portfolio_version()}"
+    return cache.get_or_fetch(
+        cache_key,
+        VALUATION_TTL,
+        lambda: _enrich_with_prices(_read_portfolio()["holdings"]),
+    )
+
+
+# Holdings change with the user's own edits, so browsers must revalidate
+# (a cheap 304 while nothing changed) rather than reuse a cached copy.
+NO_CACHE = {"Cache-Control": "no-cache"}
+
+
 @router.get("/portfolio")
-def get_portfolio():
-    portfolio = _read_portfolio()
-    enriched = _enrich_with_prices(portfolio["holdings"])
-    return {"holdings": enriched}
+async def get_portfolio(response: Response):
+    response.headers.update(NO_CACHE)
+    return {"holdings": await aio.run_blocking(_valuation)}
 
 
 @router.get("/portfolio/summary")
-def get_portfolio_summary():
-    portfolio = _read_portfolio()
-    enriched = _enrich_with_prices(portfolio["holdings"])
+async def get_portfolio_summary(response: Response):
+    response.headers.update(NO_CACHE)
+    enriched = await aio.run_blocking(_valuation)
+    priced = [h for h in enriched if h["value"] is not None]
 
-    total_value = sum(h["value"] for h in enriched)
-    total_cost = sum(h["cost"] for h in enriched)
+    total_value = sum(h["value"] for h in priced)
+    total_cost = sum(h["cost"] for h in priced)
     total_gain = round(total_value - total_cost, 2)
     total_gain_pct = round((total_gain / total_cost) * 100, 2) if total_cost else 0
-    daily_change = sum(h["dailyChange"] * h["shares"] for h in enriched)
+    daily_change = sum(h["dailyChange"] * h["shares"] for h in priced)
 
     allocation = []
-    for h in enriched:
+    for h in priced:
         allocation.append({
             "ticker": h["ticker"],
             "value": h["value"],
@@ -100,12 +203,14 @@ def get_portfolio_summary():
         "totalGainPercent": total_gain_pct,
         "dailyChange": round(daily_change, 2),
         "allocation": allocation,
+        "unpriced": [h["ticker"] for h in enriched if h["value"] is None],
+        "stale": [h["ticker"] for h in priced if h["stale"]],
     }
 
 
 @router.post("/portfolio/holdings")
 def add_holding(req: HoldingRequest):
-    with _lock:
+    with _portfolio_lock():
         portfolio = _read_portfolio()
         existing = next((h for h in portfolio["holdings"] if h["ticker"] == req.ticker.upper()), None)
         if existing:
@@ -123,7 +228,7 @@ def add_holding(req: HoldingRequest):
 
 @router.put("/portfolio/holdings/{ticker}")
 def update_holding(ticker: str, req: HoldingRequest):
-    with _lock:
+    with _portfolio_lock():
         portfolio = _read_portfolio()
         found = False
         for h in portfolio["holdings"]:
@@ -141,7 +246,7 @@ def update_holding(ticker: str, req: HoldingRequest):
 
 @router.delete("/portfolio/holdings/{ticker}")
 def delete_holding(ticker: str):
-    with _lock:
+    with _portfolio_lock():
         portfolio = _read_portfolio()
         original_len = len(portfolio["holdings"])
         portfolio["holdings"] = [h for h in portfolio["holdings"] if h["ticker"] != ticker.upper()]
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bar_store
+
+
+def _bars(closes, start="2025-01-02"):
+    index = pd.date_range(start, periods=len(closes), freq="D", tz="America/New_York")
+    closes = np.asarray(closes, dtype="f8")
+    return pd.DataFrame(
+        {"Open": closes, "High": closes + 1, "Low": closes - 1, "Close": closes, "Volume": 1000.0},
+        index=index,
+    )
+
+
+class FakeUpstream:
+    """Stands in for yf.Ticker.history over a mutable full history."""
+
+    def __init__(self, history: pd.DataFrame):
+        self.history = history
+        self.calls = []
+
+    def __call__(self, symbol, interval, period=None, start=None):
+        self.calls.append("period" if period else "start")
+        if start is not None:
+            return self.history[self.history.index >= start]
+        return self.history
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    monkeypatch.setattr(bar_store, "BARS_DIR", tmp_path)
+    fake = FakeUpstream(_bars(np.arange(100.0, 110.0)))
+    monkeypatch.setattr(bar_store, "_download", fake)
+    return fake
+
+
+def test_delta_sync_appends_new_bars(upstream):
+    bar_store._sync("TEST", "1d", "1y")
+    upstream.history = _bars(np.arange(100.0, 112.0))
+
+    _, frame = bar_store._sync("TEST", "1d", "1y")
+
+    assert upstream.calls == ["period", "start"]
+    assert frame["Close"].tolist() == list(np.arange(100.0, 112.0))
+
+
+def test_split_rebuilds_store(upstream):
+    bar_store._sync("TEST", "1d", "1y")
+    # 2-for-1 split: upstream back-adjusts every earlier bar and adds new ones.
+    upstream.history = _bars(np.arange(100.0, 112.0) / 2)
+
+    _, frame = bar_store._sync("TEST", "1d", "1y")
+
+    assert upstream.calls == ["period", "start", "period"]
+    assert frame["Close"].tolist() == list(np.arange(100.0, 112.0) / 2)
+    stored, _ = bar_store._load("TEST", "1d")
+    assert np.asarray(stored["close"]).tolist() == list(np.arange(100.0, 112.0) / 2)
+
+
+def test_revised_last_bar_is_not_a_split(upstream):
+    bar_store._sync("TEST", "1d", "1y")
+    # Only the still-forming last bar moved.
+    closes = np.arange(100.0, 110.0)
+    closes[-1] += 3
+    upstream.history = _bars(closes)
+
+    _, frame = bar_store._sync("TEST", "1d", "1y")
+
+    assert upstream.calls == ["period", "start"]
+    assert frame["Close"].tolist() == closes.tolist()
+
+
+def test_revised_only_bar_is_not_a_split(upstream):
+    upstream.history = _bars([100.0])
+    bar_store._sync("TEST", "1d", "1y")
+    # A young listing: the single stored bar is still live and moves.
+    upstream.history = _bars([103.0])
+
+    _, frame = bar_store._sync("TEST", "1d", "1y")
+
+    assert upstream.calls == ["period", "start"]
+    assert frame["Close"].tolist() == [103.0]
@@ -0,0 +1,50 @@
+import asyncio
+
+import cache
+
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    cache.clear()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"price": 1.0}
+
+    async def run():
+        leader = asyncio.create_task(cache.aget_or_fetch("quote:LEAD", 60, fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.aget_or_fetch("quote:LEAD", 60, fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        value = await follower
+        assert leader.cancelled()
+        return value
+
+    assert asyncio.run(run()) == {"price": 1.0}
+    assert calls == 1
+    assert cache.get("quote:LEAD", ttl=60) == {"price": 1.0}
+
+
+def test_fetch_errors_reach_every_waiter():
+    cache.clear()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            cache.aget_or_fetch("quote:FAIL", 60, fetch),
+            cache.aget_or_fetch("quote:FAIL", 60, fetch),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+    assert "quote:FAIL" not in cache._ainflight
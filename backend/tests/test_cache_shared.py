@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import cache
+
+
+class SlowBackend:
+    name = "slow"
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.data = {}
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return self.data.get(key)
+
+    def set(self, key, stored_at, value, ttl):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        self.data[key] = (stored_at, value)
+
+    def clear(self):
+        self.data.clear()
+
+
+def test_async_path_keeps_shared_io_off_the_loop(monkeypatch):
+    backend = SlowBackend(0.2)
+    monkeypatch.setattr(cache, "_shared", backend)
+    cache.clear()
+
+    async def fetch():
+        return {"price": 1.0}
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        tick_task = asyncio.create_task(ticker())
+        value = await cache.aget_or_fetch("quote:TEST", 60, fetch)
+        # The write is still in flight; the value is already served locally.
+        assert cache.get("quote:TEST", ttl=60) == value
+        await asyncio.gather(*cache._background)
+        tick_task.cancel()
+        return value, ticks
+
+    value, ticks = asyncio.run(run())
+    assert value == {"price": 1.0}
+    assert "quote:TEST" in backend.data
+    # Two 0.2 s blocking calls ran while the loop kept ticking.
+    assert ticks >= 20
+    assert threading.get_ident() not in backend.threads
+
+    # Another worker: local miss, served from the shared store off the loop.
+    cache.clear()
+    backend.data["quote:OTHER"] = (time.time(), {"price": 2.0})
+    backend.threads.clear()
+
+    async def never():
+        raise AssertionError("should be served from the shared store")
+
+    assert asyncio.run(cache.aget_or_fetch("quote:OTHER", 60, never)) == {"price": 2.0}
+    assert threading.get_ident() not in backend.threads
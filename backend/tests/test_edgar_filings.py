@@ -0,0 +1,69 @@
+import asyncio
+
+import cache
+import edgar
+
+
+def _block(dates, forms):
+    return {
+        "form": forms,
+        "filingDate": dates,
+        "accessionNumber": [f"0000000000-00-{i:06d}" for i in range(len(forms))],
+        "primaryDocument": ["doc.htm"] * len(forms),
+        "primaryDocDescription": forms,
+    }
+
+
+def test_index_sorts_newest_first_with_undated_last():
+    index = edgar._index_filings([
+        _block(["2024-02-01", "", "2023-11-01"], ["10-K", "8-K", "10-Q"]),
+        _block(["2010-10-27"], ["10-K"]),
+    ])
+
+    assert index["form"].tolist() == ["10-K", "10-Q", "10-K", "8-K"]
+    assert str(index["date"][-1]) == "NaT"
+
+
+def test_failed_shard_keeps_recent_filings(monkeypatch):
+    async def submissions(cik):
+        return {"filings": {
+            "recent": _block(["2024-02-01"], ["10-K"]),
+            "files": [{"name": "ok.json"}, {"name": "timeout.json"}],
+        }}
+
+    async def shard(name):
+        if name == "timeout.json":
+            raise TimeoutError("read timed out")
+        return _block(["2010-10-27"], ["10-Q"])
+
+    monkeypatch.setattr(edgar, "get_submissions", submissions)
+    monkeypatch.setattr(edgar, "_get_submissions_file", shard)
+
+    index = asyncio.run(edgar._build_filings_index(320193))
+
+    assert index["form"].tolist() == ["10-K", "10-Q"]
+
+
+def test_free_text_columns_are_not_padded():
+    block = _block(["2024-02-01", "2023-11-01"], ["10-K", "8-K"])
+    block["primaryDocDescription"] = ["x" * 500, "short"]
+    index = edgar._index_filings([block])
+
+    assert index["description"].dtype == object
+    assert index["document"].dtype == object
+    assert index["form"].dtype.kind == "U"
+    assert index["description"].tolist() == ["x" * 500, "short"]
+
+
+def test_shards_are_cached_apart_and_trimmed(monkeypatch):
+    cache.clear()
+
+    async def fetch(name):
+        return {**_block(["2010-10-27"], ["10-Q"]), "act": ["34"], "size": [1234]}
+
+    monkeypatch.setattr(edgar, "_fetch_submissions_file", fetch)
+    shard = asyncio.run(edgar._get_submissions_file("CIK0000320193-submissions-001.json"))
+
+    assert set(shard) == set(edgar.FILING_COLUMNS.values())
+    assert "edgar_shard" in cache.stats()
+    assert "edgar" not in cache.stats()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import indicator_engine
+from routers import indicators
+
+NAMES = ["sma_5", "sma_20", "ema_12", "rsi", "macd", "bbands", "vwap", "stoch"]
+
+
+def _hist(n=300, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.standard_normal(n).cumsum()
+    # Flat stretches exercise RSI's zero-loss case and a zero stochastic range.
+    close[40:70] = close[40]
+    high = close + rng.uniform(0, 1, n)
+    low = close - rng.uniform(0, 1, n)
+    high[40:70] = low[40:70] = close[40:70]
+    volume = rng.integers(1_000, 50_000, n).astype("f8")
+    volume[:3] = 0
+    index = pd.date_range("2026-01-05 09:30", periods=n, freq="5min", tz="America/New_York")
+    return pd.DataFrame({"Open": close, "High": high, "Low": low, "Close": close, "Volume": volume}, index=index)
+
+
+def _assert_matches(name, incremental, batch):
+    for field, expected in batch.items():
+        expected = np.asarray(expected, dtype="f8")
+        actual = incremental[field]
+        np.testing.assert_array_equal(np.isnan(actual), np.isnan(expected), err_msg=f"{name}.{field} NaN positions")
+        np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=f"{name}.{field}")
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_incremental_matches_batch(name):
+    hist = _hist()
+    engine = indicator_engine.IndicatorEngine([name])
+    columns = hist[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype="f8")
+    for time, bar in zip(hist.index.asi8.tolist(), columns.tolist()):
+        engine.update(time, tuple(bar))
+
+    _assert_matches(name, engine.series(name), indicators._compute(name, hist))
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_revised_last_bar_matches_batch(name):
+    hist = _hist()
+    engine = indicator_engine.IndicatorEngine([name])
+    columns = hist[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype="f8")
+    for time, bar in zip(hist.index.asi8.tolist(), columns.tolist()):
+        # Each bar first arrives half-formed, then final.
+        o, h, l, c, v = bar
+        engine.update(time, (o, h, l, (o + c) / 2, v / 2))
+        engine.update(time, (o, h, l, c, v))
+
+    _assert_matches(name, engine.series(name), indicators._compute(name, hist))
+
+
+def test_sync_returns_series_aligned_with_times():
+    hist = _hist()
+    indicator_engine._engines.clear()
+    indicator_engine.sync("TEST", "5m", hist, ["rsi"])
+    # A later request still holding fewer bars must not see the longer series.
+    times, series = indicator_engine.sync("TEST", "5m", hist.iloc[:250], ["rsi", "macd"])
+
+    # Epoch ns whatever the index's own unit (date_range gives microseconds here).
+    assert times.tolist() == hist.index[:250].as_unit("ns").asi8.tolist()
+    assert set(series) == {"rsi", "macd"}
+    assert all(len(values) == 250 for fields in series.values() for values in fields.values())
+    _assert_matches("macd", series["macd"], indicators._compute("macd", hist.iloc[:250]))
+
+
+@pytest.mark.parametrize("name", NAMES)
+def test_nan_bar_matches_batch(name):
+    hist = _hist()
+    # Yahoo occasionally sends a row with no prices.
+    hist.iloc[150, :4] = np.nan
+    engine = indicator_engine.IndicatorEngine([name])
+    columns = hist[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype="f8")
+    for time, bar in zip(hist.index.asi8.tolist(), columns.tolist()):
+        engine.update(time, tuple(bar))
+
+    _assert_matches(name, engine.series(name), indicators._compute(name, hist))
@@ -0,0 +1,70 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+import edgar_store
+import ingest_edgar
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(edgar_store, "DB_PATH", tmp_path / "edgar.sqlite")
+    monkeypatch.setattr(edgar_store, "_local", threading.local())
+    monkeypatch.setattr(edgar_store, "OFFLINE", False)
+    return tmp_path
+
+
+def _archive(tmp_path: Path, name: str, mtime: float) -> str:
+    # Copy so the snapshot time is recent however old the checkout is.
+    path = tmp_path / name
+    shutil.copy(FIXTURES / name, path)
+    os.utime(path, (mtime, mtime))
+    return str(path)
+
+
+def test_ingest_company_facts(store):
+    snapshot = time.time() - 60
+    count = ingest_edgar.ingest_company_facts(_archive(store, "companyfacts.zip", snapshot))
+
+    assert count == 2
+    conn = edgar_store._conn()
+    rows = conn.execute("SELECT cik, snapshot FROM facts ORDER BY cik").fetchall()
+    assert rows == [(320193, pytest.approx(snapshot)), (789019, pytest.approx(snapshot))]
+
+    facts = edgar_store.company_facts(320193)
+    assert set(facts["concepts"]) == {"NetIncomeLoss", "EarningsPerShareBasic"}
+    assert facts["concepts"]["NetIncomeLoss"]["form"].tolist() == ["10-K", "10-K", "10-Q"]
+    assert facts["annual"] == {
+        "columns": ["2023", "2022"],
+        "rows": [
+            {"label": "Net Income", "values": {"2023": 96995000000, "2022": 99803000000}},
+            {"label": "EPS (Basic)", "values": {"2023": 6.16, "2022": None}},
+        ],
+    }
+    assert facts["quarterly"]["columns"] == ["2023-07"]
+    assert edgar_store.company_facts(1) is None
+
+
+def test_ingest_submissions(store):
+    count = ingest_edgar.ingest_submissions(_archive(store, "submissions.zip", time.time()))
+
+    assert count == 1
+    submissions = edgar_store.submissions(320193)
+    assert submissions["name"] == "Apple Inc."
+    assert submissions["filings"]["recent"]["form"] == ["10-K", "10-Q"]
+    shard = edgar_store.submissions_file("CIK0000320193-submissions-001.json")
+    assert shard["accessionNumber"] == ["0001193125-10-238044"]
+    row = edgar_store._conn().execute("SELECT cik FROM submission_files").fetchall()
+    assert row == [(320193,)]
+
+
+def test_stale_snapshot_is_ignored(store):
+    ingest_edgar.ingest_submissions(_archive(store, "submissions.zip", time.time() - edgar_store.MAX_AGE - 60))
+
+    assert edgar_store.submissions(320193) is None
@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+import llm
+
+
+class FakeMessages:
+    async def create(self, **kwargs):
+        await asyncio.sleep(0.2)
+        return "ok"
+
+
+class FakeClient:
+    messages = FakeMessages()
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    monkeypatch.setattr(llm, "_client", FakeClient())
+
+
+def test_call_timeout_starts_once_the_slot_is_held(monkeypatch):
+    async def run():
+        monkeypatch.setattr(llm, "_semaphore", asyncio.Semaphore(1))
+        first = asyncio.create_task(llm.create(call_timeout=1))
+        await asyncio.sleep(0.01)
+        # Queued ~0.2 s behind the first call, then takes 0.2 s itself.
+        second = await llm.create(call_timeout=0.3)
+        return await first, second
+
+    assert asyncio.run(run()) == ("ok", "ok")
+
+
+def test_queue_wait_and_call_timeouts_are_reported_separately(monkeypatch):
+    async def run():
+        monkeypatch.setattr(llm, "_semaphore", asyncio.Semaphore(1))
+        with pytest.raises(TimeoutError):
+            await llm.create(call_timeout=0.05)
+        holder = asyncio.create_task(llm.create())
+        await asyncio.sleep(0.01)
+        with pytest.raises(llm.QueueTimeout):
+            await llm.create(call_timeout=1, queue_timeout=0.05)
+        await holder
+        return llm._semaphore._value
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,43 @@
+import asyncio
+
+import cache
+import quote_stream
+
+
+def _drain(queue: asyncio.Queue) -> list[dict]:
+    return [queue.get_nowait() for _ in range(queue.qsize())]
+
+
+def test_full_queue_merges_deltas_instead_of_dropping():
+    queue: asyncio.Queue = asyncio.Queue(maxsize=3)
+    offer = quote_stream.QuoteHub._offer
+    offer(queue, {"symbol": "AAPL", "price": 1, "change": 0.1, "extPrice": 1.5})
+    offer(queue, {"symbol": "MSFT", "price": 2})
+    offer(queue, {"symbol": "AAPL", "price": 3})
+    offer(queue, {"symbol": "AAPL", "volume": 10})
+
+    assert _drain(queue) == [
+        {"symbol": "AAPL", "price": 3, "change": 0.1, "extPrice": 1.5, "volume": 10},
+        {"symbol": "MSFT", "price": 2},
+    ]
+
+
+def test_pollers_do_not_record_into_the_subscribing_request(monkeypatch):
+    fetched = asyncio.Event()
+
+    def get_quote(symbol):
+        cache.get(f"quote:{symbol}", ttl=60)
+        fetched.set()
+        return {"symbol": symbol, "price": 1}
+
+    monkeypatch.setattr(quote_stream.market_data, "get_quote", get_quote)
+
+    async def run():
+        hub = quote_stream.QuoteHub(interval=60)
+        with cache.track() as reads:
+            queue = hub.subscribe(["AAPL"])
+        await fetched.wait()
+        hub.unsubscribe(queue, ["AAPL"])
+        return reads
+
+    assert asyncio.run(run()) == {}
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+import responses
+
+
+def _roundtrip(values: np.ndarray, decimals: int) -> np.ndarray:
+    data = responses._compact(values, decimals)
+    return np.round(data.astype("f8"), decimals)
+
+
+@pytest.mark.parametrize("values, decimals", [
+    # Prices just above 2**17, where float32 steps are 1/64.
+    ([131072.37, 150000.01, 131071.99, 99.5], 2),
+    # MACD-sized values where 4 decimals outrun float32.
+    ([1024.0003, 1500.0001, 1676.9999, -1300.5555], 4),
+])
+def test_compact_keeps_values_exact_near_float32_limit(values, decimals):
+    values = np.array(values + [np.nan])
+    expected = np.round(values, decimals)
+    assert np.array_equal(_roundtrip(values, decimals), expected, equal_nan=True)
+    assert responses._compact(values, decimals).dtype == np.dtype("<f8")
+
+
+def test_compact_uses_float32_when_exact():
+    values = np.array([101.25, 99.5, np.nan, 0.01, 12345.67])
+    data = responses._compact(values, 2)
+    assert data.dtype == np.dtype("<f4")
+    assert np.array_equal(np.round(data.astype("f8"), 2), np.round(values, 2), equal_nan=True)
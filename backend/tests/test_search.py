@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import cache
+import edgar
+from routers import market
+
+LOCAL = [
+    {"symbol": "BTC", "name": "Grayscale Bitcoin Mini Trust", "exchange": "NYSE"},
+    {"symbol": "BTCS", "name": "BTCS Inc.", "exchange": "Nasdaq"},
+]
+REMOTE = [
+    {"symbol": "BTC-USD", "name": "Bitcoin USD", "exchange": "CCC", "type": "CRYPTOCURRENCY"},
+    {"symbol": "BTC", "name": "Grayscale Bitcoin Mini Trust ETF", "exchange": "NYSEArca", "type": "ETF"},
+]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    cache.clear()
+
+
+def test_local_matches_are_merged_with_yahoo(monkeypatch):
+    monkeypatch.setattr(edgar, "search_tickers", lambda query, limit: LOCAL)
+
+    async def remote(query):
+        return REMOTE
+
+    monkeypatch.setattr(market, "_search", remote)
+    results = asyncio.run(market.search_ticker("btc"))
+    assert [r["symbol"] for r in results] == ["BTC", "BTC-USD", "BTCS"]
+    # Yahoo's copy of a symbol carries the real type; local-only ones have none.
+    assert results[0]["type"] == "ETF"
+    assert "type" not in results[2]
+
+
+def test_local_matches_survive_yahoo_failure(monkeypatch):
+    monkeypatch.setattr(edgar, "search_tickers", lambda query, limit: LOCAL)
+
+    async def remote(query):
+        raise HTTPException(status_code=502, detail="Search service unavailable")
+
+    monkeypatch.setattr(market, "_search", remote)
+    assert asyncio.run(market.search_ticker("btc")) == LOCAL
+
+    monkeypatch.setattr(edgar, "search_tickers", lambda query, limit: [])
+    with pytest.raises(HTTPException):
+        asyncio.run(market.search_ticker("zzzz"))
@@ -7,6 +7,7 @@ import { useState } from 'react'
 export default function AnalysisPanel() {
   const { selectedTicker } = useTicker()
   const { results, loading, error, analyze } = useAnalysis()
+  const streaming = results.some((r) => r.pending)
   const [selectedAnalysts, setSelectedAnalysts] = useState<string[]>([
     'buffett', 'wood', 'lee', 'micha', 'dalio',
   ])
@@ -30,10 +31,10 @@ export default function AnalysisPanel() {
 
       <button
         onClick={handleAnalyze}
-        disabled={loading || selectedAnalysts.length === 0}
+        disabled={loading || streaming || selectedAnalysts.length === 0}
         className="px-6 py-2.5 bg-yellow-400 text-gray-900 font-medium rounded-lg text-sm hover:bg-yellow-300 disabled:opacity-50 transition-colors"
       >
-        {loading ? 'Analyzing...' : `Analyze ${selectedTicker}`}
+        {loading || streaming ? 'Analyzing...' : `Analyze ${selectedTicker}`}
       </button>
 
       {error && (
@@ -48,7 +49,7 @@ export default function AnalysisPanel() {
         </div>
       )}
 
-      {!loading && results.length > 0 && (
+      {results.length > 0 && (
         <div className="space-y-4">
           {results.map((r, i) => (
             <AnalystCard key={i} result={r} />
@@ -10,10 +10,17 @@ export default function AnalystCard({ result }: { result: AnalystResult }) {
       <div className="flex items-baseline gap-2 mb-1">
         <h3 className="text-sm font-semibold text-white">{result.analyst}</h3>
         <span className="text-xs text-yellow-400/70">{result.style}</span>
+        {result.pending && !result.analysis && (
+          <span className="text-xs text-gray-500 animate-pulse">thinking…</span>
+        )}
       </div>
-      <p className="text-sm text-gray-300 whitespace-pre-line leading-relaxed">
-        {result.analysis}
-      </p>
+      {result.error ? (
+        <p className="text-sm text-red-400/80">Analysis unavailable: {result.error}</p>
+      ) : (
+        <p className="text-sm text-gray-300 whitespace-pre-line leading-relaxed">
+          {result.analysis}
+        </p>
+      )}
     </div>
   )
 }
@@ -1,7 +1,8 @@
 import type { Holding } from '../../types/portfolio'
 import { Trash2 } from 'lucide-react'
 
-function fmt(n: number) {
+function fmt(n: number | null) {
+  if (n == null) return '—'
   return n.toLocaleString('en-US', { style: 'currency', currency: 'USD' })
 }
 
@@ -40,13 +41,18 @@ export default function HoldingsTable({ holdings, onDelete }: Props) {
               <td className="py-3 px-4 font-medium text-white">{h.ticker}</td>
               <td className="text-right py-3 px-4 text-gray-300">{h.shares}</td>
               <td className="text-right py-3 px-4 text-gray-300">{fmt(h.buyPrice)}</td>
-              <td className="text-right py-3 px-4 text-gray-300">{fmt(h.currentPrice)}</td>
+              <td
+                className={`text-right py-3 px-4 ${h.stale ? 'text-amber-400' : 'text-gray-300'}`}
+                title={h.priceError ?? (h.stale ? 'Last known price' : undefined)}
+              >
+                {fmt(h.currentPrice)}
+              </td>
               <td className="text-right py-3 px-4 text-white font-medium">{fmt(h.value)}</td>
-              <td className={`text-right py-3 px-4 ${h.gain >= 0 ? 'text-emerald-400' : 'text-red-400'}`}>
+              <td className={`text-right py-3 px-4 ${(h.gain ?? 0) >= 0 ? 'text-emerald-400' : 'text-red-400'}`}>
                 {fmt(h.gain)}
               </td>
-              <td className={`text-right py-3 px-4 ${h.gainPercent >= 0 ? 'text-emerald-400' : 'text-red-400'}`}>
-                {h.gainPercent >= 0 ? '+' : ''}{h.gainPercent.toFixed(2)}%
+              <td className={`text-right py-3 px-4 ${(h.gainPercent ?? 0) >= 0 ? 'text-emerald-400' : 'text-red-400'}`}>
+                {h.gainPercent == null ? '—' : `${h.gainPercent >= 0 ? '+' : ''}${h.gainPercent.toFixed(2)}%`}
               </td>
               <td className="py-3 px-4">
                 <button
@@ -1,6 +1,6 @@
 import { createContext, useContext, useState, useEffect, useCallback, useRef, type ReactNode } from 'react'
-import type { Ticker } from '../types/market'
-import { getQuote } from '../services/api'
+import type { Ticker, Quote } from '../types/market'
+import { getQuote, getQuotes, streamQuotes } from '../services/api'
 
 export type TabId = 'chart' | 'fundamentals' | 'news' | 'portfolio' | 'analysis'
 
@@ -88,29 +88,54 @@ export function TickerProvider({ children }: { children: ReactNode }) {
 
   const refreshQuotes = useCallback(async () => {
     const current = watchlistRef.current
-    const updated = await Promise.all(
-      current.map(async (t) => {
-        try {
-          const q = await getQuote(t.symbol)
-          return {
-            ...t, price: q.price, change: q.change, changePercent: q.changePercent,
-            extPrice: q.extPrice, extChange: q.extChange, extChangePercent: q.extChangePercent, extLabel: q.extLabel,
-          }
-        } catch {
-          return t
-        }
-      }),
-    )
+    if (current.length === 0) return
+    let quotes: Record<string, Quote>
+    try {
+      quotes = await getQuotes(current.map((t) => t.symbol))
+    } catch {
+      return
+    }
+    const updated = current.map((t) => {
+      const q = quotes[t.symbol.toUpperCase()]
+      if (!q) return t
+      return {
+        ...t, price: q.price, change: q.change, changePercent: q.changePercent,
+        extPrice: q.extPrice, extChange: q.extChange, extChangePercent: q.extChangePercent, extLabel: q.extLabel,
+      }
+    })
     setWatchlist(updated)
     saveWatchlist(updated)
   }, [])
 
   useEffect(() => {
     refreshQuotes()
-    const id = setInterval(refreshQuotes, 60_000)
-    return () => clearInterval(id)
   }, [])
 
+  // Live updates for everything on the watchlist; the server runs one poller
+  // per symbol no matter how many tabs are subscribed.
+  const watchedSymbols = watchlist.map((t) => t.symbol).join(',')
+  useEffect(() => {
+    if (!watchedSymbols) return
+    return streamQuotes(watchedSymbols.split(','), (update) => {
+      setWatchlist((prev) => {
+        const updated = prev.map((t) => {
+          if (t.symbol.toUpperCase() !== update.symbol) return t
+          const next = { ...t }
+          if (update.price !== undefined) next.price = update.price
+          if (update.change !== undefined) next.change = update.change
+          if (update.changePercent !== undefined) next.changePercent = update.changePercent
+          if (update.extPrice !== undefined) next.extPrice = update.extPrice
+          if (update.extChange !== undefined) next.extChange = update.extChange
+          if (update.extChangePercent !== undefined) next.extChangePercent = update.extChangePercent
+          if (update.extLabel !== undefined) next.extLabel = update.extLabel
+          return next
+        })
+        saveWatchlist(updated)
+        return updated
+      })
+    })
+  }, [watchedSymbols])
+
   return (
     <TickerContext.Provider value={{
       selectedTicker, setSelectedTicker, watchlist,
@@ -1,6 +1,6 @@
 import { useState } from 'react'
 import type { AnalystResult } from '../types/analysis'
-import { getAnalysis } from '../services/api'
+import { streamAnalysis } from '../services/api'
 
 export function useAnalysis() {
   const [results, setResults] = useState<AnalystResult[]>([])
@@ -12,8 +12,10 @@ export function useAnalysis() {
     setError(null)
     setResults([])
     try {
-      const data = await getAnalysis(ticker, analysts)
-      setResults(data)
+      await streamAnalysis(ticker, analysts, (data) => {
+        setResults(data)
+        setLoading(false)
+      })
     } catch (e: unknown) {
       setError(e instanceof Error ? e.message : 'Analysis failed')
     } finally {
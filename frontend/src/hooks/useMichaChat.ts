@@ -1,6 +1,6 @@
 import { useState, useCallback } from 'react'
 import type { ChatMessage, AgentState } from '../types/agent'
-import { askMicha } from '../services/api'
+import { streamMicha } from '../services/api'
 
 let msgId = 0
 
@@ -19,16 +19,28 @@ export function useMichaChat(ticker: string) {
       setMessages((prev) => [...prev, userMsg])
       setAgentState('thinking')
 
+      // Placeholder the streamed text is written into; replaced by the final reply.
+      const draftId = `draft-${++msgId}`
+      let started = false
+
       try {
-        const reply = await askMicha(content, ticker)
+        const reply = await streamMicha(content, ticker, (text) => {
+          if (!started) {
+            started = true
+            setAgentState('talking')
+            setMessages((prev) => [...prev, { id: draftId, role: 'agent', content: text, timestamp: Date.now() }])
+          } else {
+            setMessages((prev) => prev.map((m) => (m.id === draftId ? { ...m, content: text } : m)))
+          }
+        })
         setAgentState('talking')
-        setMessages((prev) => [...prev, reply])
+        setMessages((prev) => [...prev.filter((m) => m.id !== draftId), reply])
         setTimeout(() => setAgentState('idle'), 1500)
       } catch (err) {
         console.error('Micha error:', err)
         setAgentState('idle')
         setMessages((prev) => [
-          ...prev,
+          ...prev.filter((m) => m.id !== draftId),
           {
             id: String(++msgId),
             role: 'agent',
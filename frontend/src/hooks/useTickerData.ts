@@ -11,7 +11,7 @@ export function useTickerData(symbol: string, range = '1M') {
     let cancelled = false
     setLoading(true)
 
-    getOHLC(symbol, range)
+    getOHLC(symbol, range, { packed: true })
       .then((data) => {
         if (!cancelled) {
           setBars(data.bars)
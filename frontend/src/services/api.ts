@@ -1,6 +1,6 @@
 import type { Quote, Bar } from '../types/market'
 import type { ChatMessage } from '../types/agent'
-import type { CompanyOverview, FinancialData, EarningsEntry, Recommendations, SecFiling } from '../types/fundamentals'
+import type { CompanyOverview, FinancialData, EarningsEntry, Recommendations, SecFilingsPage } from '../types/fundamentals'
 import type { NewsArticle } from '../types/news'
 import type { Holding, PortfolioSummaryData, HoldingRequest } from '../types/portfolio'
 import type { AnalystResult } from '../types/analysis'
@@ -11,7 +11,7 @@ export interface SearchResult {
   symbol: string
   name: string
   exchange: string
-  type: string
+  type?: string
 }
 
 export async function searchTicker(query: string): Promise<SearchResult[]> {
@@ -26,10 +26,129 @@ export async function getQuote(symbol: string): Promise<Quote> {
   return res.json()
 }
 
-export async function getOHLC(symbol: string, range = '1M'): Promise<{ bars: Bar[]; interval: string }> {
-  const res = await fetch(`${BASE}/ohlc/${symbol}?range=${range}`)
+export interface QuoteBatch {
+  symbol: string[]
+  price: number[]
+  change: number[]
+  changePercent: number[]
+  high: number[]
+  low: number[]
+  volume: number[]
+  extPrice: (number | null)[]
+  extChange: (number | null)[]
+  extChangePercent: (number | null)[]
+  extLabel: (string | null)[]
+  missing: string[]
+}
+
+export async function getQuotes(symbols: string[]): Promise<Record<string, Quote>> {
+  const res = await fetch(`${BASE}/quotes?symbols=${symbols.map(encodeURIComponent).join(',')}`)
+  if (!res.ok) throw new Error('Failed to fetch quotes')
+  const batch: QuoteBatch = await res.json()
+  const quotes: Record<string, Quote> = {}
+  batch.symbol.forEach((symbol, i) => {
+    quotes[symbol] = {
+      symbol,
+      price: batch.price[i],
+      change: batch.change[i],
+      changePercent: batch.changePercent[i],
+      high: batch.high[i],
+      low: batch.low[i],
+      volume: batch.volume[i],
+      extPrice: batch.extPrice[i],
+      extChange: batch.extChange[i],
+      extChangePercent: batch.extChangePercent[i],
+      extLabel: batch.extLabel[i],
+    }
+  })
+  return quotes
+}
+
+// Server-pushed quote updates. The first event per symbol is a full quote,
+// later ones carry only the fields that changed. Returns a function that
+// closes the stream.
+export function streamQuotes(
+  symbols: string[],
+  onUpdate: (update: Partial<Quote> & { symbol: string }) => void,
+): () => void {
+  const source = new EventSource(`${BASE}/stream/quotes?symbols=${symbols.map(encodeURIComponent).join(',')}`)
+  source.addEventListener('quote', (e) => onUpdate(JSON.parse((e as MessageEvent).data)))
+  return () => source.close()
+}
+
+// Packed chart series (see backend/responses.py): a uint32 header length,
+// a JSON header, then 8-byte aligned little-endian column buffers that are
+// used in place as typed arrays.
+const PACKED_MEDIA_TYPE = 'application/vnd.stock-platform.packed'
+const TYPED_ARRAYS = { uint32: Uint32Array, float32: Float32Array, float64: Float64Array }
+
+interface PackedHeader {
+  meta: Record<string, string>
+  tables: Record<string, {
+    length: number
+    decimals: number
+    columns: { name: string; type: keyof typeof TYPED_ARRAYS; offset: number }[]
+  }>
+}
+
+export interface PackedTable {
+  length: number
+  decimals: number
+  columns: Record<string, Uint32Array | Float32Array | Float64Array>
+}
+
+async function readPacked(res: Response): Promise<{ meta: Record<string, string>; tables: Record<string, PackedTable> }> {
+  const buffer = await res.arrayBuffer()
+  const headerLength = new DataView(buffer).getUint32(0, true)
+  const header: PackedHeader = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 4, headerLength)))
+  const start = (4 + headerLength + 7) & ~7
+  const tables: Record<string, PackedTable> = {}
+  for (const [name, table] of Object.entries(header.tables)) {
+    const columns: PackedTable['columns'] = {}
+    for (const col of table.columns) {
+      columns[col.name] = new TYPED_ARRAYS[col.type](buffer, start + col.offset, table.length)
+    }
+    tables[name] = { length: table.length, decimals: table.decimals, columns }
+  }
+  return { meta: header.meta, tables }
+}
+
+// Daily and longer bars are packed as epoch seconds of their date; intraday
+// times stay epoch seconds, as in the JSON rows.
+function packedTime(seconds: number, timeFormat: string): Bar['time'] {
+  if (timeFormat === 'date') return new Date(seconds * 1000).toISOString().slice(0, 10)
+  return seconds as unknown as Bar['time']
+}
+
+// packed: fetch the binary columnar format (about 4x smaller, no JSON parse).
+export async function getOHLC(
+  symbol: string,
+  range = '1M',
+  { packed = false } = {},
+): Promise<{ bars: Bar[]; interval: string }> {
+  const res = await fetch(`${BASE}/ohlc/${symbol}?range=${range}`, {
+    headers: packed ? { Accept: PACKED_MEDIA_TYPE } : {},
+  })
   if (!res.ok) throw new Error(`Failed to fetch OHLC for ${symbol}`)
-  return res.json()
+  if (!res.headers.get('Content-Type')?.startsWith(PACKED_MEDIA_TYPE)) return res.json()
+
+  const { meta, tables } = await readPacked(res)
+  const { length, decimals, columns } = tables.bars
+  // float32 columns hold each price to `decimals` places; rounding restores it.
+  const scale = 10 ** decimals
+  const round = (v: number) => Math.round(v * scale) / scale
+  const bars: Bar[] = new Array(length)
+  for (let i = 0; i < length; i++) {
+    bars[i] = {
+      time: packedTime(columns.time[i], meta.timeFormat),
+      open: round(columns.open[i]),
+      high: round(columns.high[i]),
+      low: round(columns.low[i]),
+      close: round(columns.close[i]),
+      volume: columns.volume[i],
+    }
+  }
+  return { bars, interval: meta.interval }
 }
 
 export async function askMicha(
@@ -45,6 +164,57 @@ export async function askMicha(
   return res.json()
 }
 
+// Reads a text/event-stream response body (EventSource only supports GET)
+// and calls onEvent for each complete event.
+async function readEvents(
+  res: Response,
+  onEvent: (event: string, data: unknown) => void,
+): Promise<void> {
+  const reader = res.body!.pipeThrough(new TextDecoderStream()).getReader()
+  let buffer = ''
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += value
+    let end: number
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, end)
+      buffer = buffer.slice(end + 2)
+      let event = 'message'
+      let data = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7)
+        else if (line.startsWith('data: ')) data += line.slice(6)
+      }
+      if (data) onEvent(event, JSON.parse(data))
+    }
+  }
+}
+
+// Streaming askMicha: onDelta gets the text generated so far.
+export async function streamMicha(
+  message: string,
+  ticker: string,
+  onDelta: (text: string) => void,
+): Promise<ChatMessage> {
+  const res = await fetch(`${BASE}/agent/ask/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ message, ticker }),
+  })
+  if (!res.ok) throw new Error('Failed to get response from Engelus')
+  let text = ''
+  let reply = null as ChatMessage | null
+  let error = null as string | null
+  await readEvents(res, (event, data) => {
+    if (event === 'delta') onDelta((text += (data as { text: string }).text))
+    else if (event === 'done') reply = data as ChatMessage
+    else if (event === 'error') error = (data as { error: string }).error
+  })
+  if (!reply) throw new Error(error ?? 'Response stream ended early')
+  return reply
+}
+
 // Indicators
 export async function getIndicators(
   symbol: string,
@@ -86,8 +256,13 @@ export async function getRecommendations(symbol: string): Promise<Recommendation
 }
 
 // SEC EDGAR
-export async function getSecFilings(symbol: string): Promise<{ filings: SecFiling[] }> {
-  const res = await fetch(`${BASE}/fundamentals/${symbol}/sec-filings`)
+export async function getSecFilings(
+  symbol: string,
+  filters: { form?: string; after?: string; before?: string; limit?: number; offset?: number } = {},
+): Promise<SecFilingsPage> {
+  const params = new URLSearchParams()
+  Object.entries(filters).forEach(([k, v]) => v !== undefined && params.set(k, String(v)))
+  const res = await fetch(`${BASE}/fundamentals/${symbol}/sec-filings?${params}`)
   if (!res.ok) throw new Error(`Failed to fetch SEC filings for ${symbol}`)
   return res.json()
 }
@@ -156,3 +331,47 @@ export async function getAnalysis(
   if (!res.ok) throw new Error('Failed to get analysis')
   return res.json()
 }
+
+// Streaming getAnalysis: all personas stream at once, and onUpdate gets the
+// full result list (in request order) every time any of them changes.
+export async function streamAnalysis(
+  ticker: string,
+  analysts: string[],
+  onUpdate: (results: AnalystResult[]) => void,
+): Promise<AnalystResult[]> {
+  const res = await fetch(`${BASE}/agent/analyze/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ ticker, analysts }),
+  })
+  if (!res.ok) throw new Error('Failed to get analysis')
+  let results: AnalystResult[] = []
+  const replace = (analyst: string, update: (r: AnalystResult) => AnalystResult) => {
+    results = results.map((r) => (r.analyst === analyst ? update(r) : r))
+  }
+  try {
+    await readEvents(res, (event, data) => {
+      if (event === 'start') {
+        const { analysts } = data as { analysts: Pick<AnalystResult, 'analyst' | 'style'>[] }
+        results = analysts.map((a) => ({ ...a, analysis: '', pending: true }))
+      } else if (event === 'delta') {
+        const delta = data as { analyst: string; text: string }
+        replace(delta.analyst, (r) => ({ ...r, analysis: r.analysis + delta.text }))
+      } else if (event === 'done') {
+        const result = data as AnalystResult
+        replace(result.analyst, () => result)
+      } else {
+        return
+      }
+      onUpdate(results)
+    })
+  } finally {
+    // A dropped connection leaves analysts without a `done`; settle them so
+    // the panel doesn't wait on them forever.
+    if (results.some((r) => r.pending)) {
+      results = results.map((r) => (r.pending ? { ...r, pending: false, error: 'Stream ended unexpectedly' } : r))
+      onUpdate(results)
+    }
+  }
+  return results
+}
@@ -2,4 +2,6 @@ export interface AnalystResult {
   analyst: string
   style: string
   analysis: string
+  error?: string
+  pending?: boolean
 }
@@ -60,3 +60,10 @@ export interface SecFiling {
   description: string
   url: string
 }
+
+export interface SecFilingsPage {
+  filings: SecFiling[]
+  total: number
+  offset: number
+  limit: number
+}
@@ -3,13 +3,15 @@ export interface Holding {
   shares: number
   buyPrice: number
   buyDate: string
-  currentPrice: number
-  value: number
+  currentPrice: number | null
+  value: number | null
   cost: number
-  gain: number
-  gainPercent: number
-  dailyChange: number
-  dailyChangePercent: number
+  gain: number | null
+  gainPercent: number | null
+  dailyChange: number | null
+  dailyChangePercent: number | null
+  stale: boolean
+  priceError: string | null
 }
 
 export interface PortfolioSummaryData {
@@ -19,6 +21,8 @@ export interface PortfolioSummaryData {
   totalGainPercent: number
   dailyChange: number
   allocation: { ticker: string; value: number; percent: number }[]
+  unpriced: string[]
+  stale: string[]
 }
 
 export interface HoldingRequest {